@@ -1,12 +1,18 @@
 """
-Simple ChatGPT chatbot using MCP client library to connect to Emotionsin.ai.
-This uses the official MCP library which handles all session management automatically.
+Simple ChatGPT chatbot connected to Emotionsin.ai.
+Uses the shared emotionsin_client package, which keeps one MCP session open,
+caches the persona contract locally and streams replies as they arrive.
 """
 
 import os
+import sys
 import asyncio
-from typing import List, Dict
-from openai import OpenAI
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from emotionsin_client import ChatEngine, ChatStream, Conversation, EmotionsinClient, MCPError, summarize_turns  # noqa: E402
+from emotionsin_client.providers import OpenAIProvider  # noqa: E402
 
 try:
     from dotenv import load_dotenv
@@ -14,27 +20,18 @@ try:
 except ImportError:
     pass
 
-# Try to import MCP client
-try:
-    from mcp.client.session import ClientSession
-    from mcp.client.sse import sse_client
-    MCP_AVAILABLE = True
-except ImportError:
-    print("ERROR: MCP library not installed!")
-    print("Install with: pip install mcp")
-    MCP_AVAILABLE = False
-    exit(1)
-
 # Configuration
 CHATGPT_API_KEY = os.getenv("OPENAI_API_KEY", "")
-MCP_SERVER_URL = "https://emotionsinai-mcp-server-572436270187.europe-west1.run.app/mcp"
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "https://emotionsinai-mcp-server-572436270187.europe-west1.run.app/mcp")
 
 #You can fetch your profile ID from your Emotionsin.ai profile settings ("Activate & Use profile section")
 PROFILE_ID = os.getenv("EMOTIONSIN_PROFILE_ID", "4e1cabf6cfbd452b951d659897d16365")
+# Prompt budget in tokens (persona contract + history); older turns are summarized to stay under it
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
 
 
 class EmotionalChatbot:
-    """Chatbot using official MCP client to connect to Emotionsin.ai."""
+    """ChatGPT chatbot with a persona from Emotionsin.ai."""
 
     def __init__(self, api_key: str, profile_id: str, mcp_server_url: str):
         if not api_key:
@@ -45,88 +42,43 @@ class EmotionalChatbot:
         self.api_key = api_key
         self.profile_id = profile_id
         self.mcp_server_url = mcp_server_url
-        self.client = OpenAI(api_key=api_key)
+        self.mcp = EmotionsinClient(mcp_server_url, client_name="emotional-chatbot-chatgpt")
+        self.engine = ChatEngine(OpenAIProvider(api_key, model="gpt-4", temperature=0.7))
+        self.conversation = Conversation(
+            self.engine,
+            system="You are a helpful assistant.",
+            budget=HISTORY_TOKEN_BUDGET,
+            summarize=summarize_turns,
+        )
         self.persona_contract = None
         self.agent_name = "Assistant"
 
-    async def fetch_persona_with_mcp_client(self) -> bool:
-        """Use official MCP client to fetch persona - handles sessions automatically!"""
-        print(f"Connecting to MCP server using official client...")
-        print(f"Profile ID: {self.profile_id}")
-        
-        # Try adding profile as query parameter (like ChatGPT might do)
-        server_url = f"{self.mcp_server_url}?profile={self.profile_id}"
-        print(f"Server: {server_url}")
-        
+    async def fetch_persona(self) -> bool:
+        """Fetch the persona through the shared MCP session (served locally while it is fresh)."""
         try:
-            # Use official MCP SSE client - it handles all session management!
-            async with sse_client(server_url) as (read_stream, write_stream):
-                async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    print("✓ MCP session initialized")
-                    
-                    # List available tools
-                    tools = await session.list_tools()
-                    print(f"Available tools: {[t.name for t in tools.tools]}")
-                    
-                    # Call the tool
-                    result = await session.call_tool(
-                        "get_agent_contract_from_link",
-                        arguments={"profile": self.profile_id}
-                    )
-                    
-                    print(f"Tool result: {result}")
-                    
-                    # Extract contract from result
-                    if result.content:
-                        for item in result.content:
-                            if hasattr(item, 'text'):
-                                import json
-                                data = json.loads(item.text)
-                                self.persona_contract = data.get("contract")
-                                self.agent_name = data.get("name", "Assistant")
-                                print(f"✓ Loaded persona: {self.agent_name}")
-                                return True
-                    
-                    return False
-                    
-        except Exception as e:
+            persona = await self.mcp.get_persona(self.profile_id)
+        except (MCPError, httpx.HTTPError) as e:
             print(f"MCP client error: {e}")
-            import traceback
-            traceback.print_exc()
             return False
+        if persona.contract != self.persona_contract:
+            self.persona_contract = persona.contract
+            self.agent_name = persona.name
+            self.conversation.system = persona.contract
+            print(f"✓ Loaded persona: {self.agent_name}")
+        return True
 
-    async def chat(self, user_message: str, conversation_history: List[Dict] = None) -> str:
-        """Chat with the agent using the persona contract."""
-        messages: List[Dict] = []
-        
-        # Add system prompt with persona contract
-        if self.persona_contract:
-            messages.append({"role": "system", "content": self.persona_contract})
-        else:
-            messages.append({"role": "system", "content": "You are a helpful assistant."})
-        
-        if conversation_history:
-            messages.extend(conversation_history)
-        
-        messages.append({"role": "user", "content": user_message})
+    async def close(self) -> None:
+        await self.mcp.aclose()
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                temperature=0.7,
-            )
-            return response.choices[0].message.content or "I couldn't generate a response."
-        except Exception as e:
-            return f"Error: {e}"
+    def chat(self, user_message: str) -> ChatStream:
+        """Start a reply to `user_message`; iterate the result to stream it."""
+        return self.conversation.send(user_message)
 
 
 async def main():
     """Main function."""
     print("=" * 60)
-    print("Emotional Chatbot - Using Official MCP Client")
+    print("Emotional Chatbot - ChatGPT + Emotionsin.ai")
     print("=" * 60)
     print()
     
@@ -137,6 +89,7 @@ async def main():
     print(f"Profile ID: {PROFILE_ID}")
     print()
     
+    chatbot = None
     try:
         chatbot = EmotionalChatbot(
             api_key=CHATGPT_API_KEY,
@@ -144,8 +97,8 @@ async def main():
             mcp_server_url=MCP_SERVER_URL
         )
         
-        # Fetch persona using official MCP client
-        success = await chatbot.fetch_persona_with_mcp_client()
+        print(f"Fetching persona from {MCP_SERVER_URL}...")
+        success = await chatbot.fetch_persona()
         
         if not success:
             print("\n⚠ Could not load persona. Using default behavior.\n")
@@ -154,10 +107,9 @@ async def main():
         print("-" * 60)
         print()
         
-        conversation_history = []
-        
         while True:
-            user_input = input("You: ").strip()
+            # input() in a thread, so the event loop (and the MCP session) stays responsive.
+            user_input = (await asyncio.to_thread(input, "You: ")).strip()
             
             if user_input.lower() in ['quit', 'exit', 'q']:
                 print("\nGoodbye!")
@@ -166,14 +118,19 @@ async def main():
             if not user_input:
                 continue
             
-            response = await chatbot.chat(user_input, conversation_history)
-            print(f"{chatbot.agent_name}: {response}\n")
-            
-            conversation_history.append({"role": "user", "content": user_input})
-            conversation_history.append({"role": "assistant", "content": response})
+            # Cheap when nothing changed: a local cache hit, or a not_modified
+            # answer on the open session once the local copy is older than max_age.
+            if success:
+                await chatbot.fetch_persona()
             
-            if len(conversation_history) > 20:
-                conversation_history = conversation_history[-20:]
+            print(f"{chatbot.agent_name}: ", end="", flush=True)
+            reply = chatbot.chat(user_input)
+            try:
+                async for piece in reply:
+                    print(piece, end="", flush=True)
+            except Exception as e:
+                print(f"Error: {e}", end="")
+            print(f"\n[{reply.stats}]\n")
                 
     except KeyboardInterrupt:
         print("\n\nGoodbye!")
@@ -181,6 +138,9 @@ async def main():
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if chatbot is not None:
+            await chatbot.close()
 
 
 if __name__ == "__main__":
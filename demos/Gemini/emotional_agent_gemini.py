@@ -1,12 +1,18 @@
 """
 Google Gemini chatbot using Emotionsin.ai MCP server.
-Uses proper session ID handling to fetch and apply emotional personas.
+Uses the shared emotionsin_client package, which keeps one MCP session open,
+caches the persona contract locally and streams replies as they arrive.
 """
 
 import os
-import json
-import requests
-from typing import List, Dict
+import sys
+import asyncio
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from emotionsin_client import ChatEngine, ChatStream, Conversation, EmotionsinClient, MCPError, summarize_turns  # noqa: E402
+from emotionsin_client.providers import GeminiProvider  # noqa: E402
 
 try:
     from dotenv import load_dotenv
@@ -26,8 +32,10 @@ except ImportError:
 
 # Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-MCP_SERVER_URL = "https://emotionsinai-mcp-server-572436270187.europe-west1.run.app/mcp"
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "https://emotionsinai-mcp-server-572436270187.europe-west1.run.app/mcp")
 PROFILE_ID = os.getenv("EMOTIONSIN_PROFILE_ID", "4e1cabf6cfbd452b951d659897d16365")
+# Prompt budget in tokens (persona contract + history); older turns are summarized to stay under it
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
 
 
 class EmotionalChatbot:
@@ -42,180 +50,40 @@ class EmotionalChatbot:
         self.api_key = api_key
         self.profile_id = profile_id
         self.mcp_server_url = mcp_server_url
+        self.mcp = EmotionsinClient(mcp_server_url, client_name="emotional-chatbot-gemini")
         
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        # Gemini streams through its async API, so the event loop is never blocked;
+        # the persona contract goes in once, as the model's system instruction
+        self.provider = GeminiProvider(api_key, model='gemini-2.5-flash')
+        self.engine = ChatEngine(self.provider)
+        self.conversation = Conversation(self.engine, budget=HISTORY_TOKEN_BUDGET, summarize=summarize_turns)
         
         self.persona_contract = None
         self.agent_name = "Assistant"
-        self.session_id = None
 
-    def fetch_persona_from_mcp(self) -> bool:
-        """Fetch persona using proper session ID from headers."""
-        print(f"Fetching persona from MCP server...")
-        print(f"Profile ID: {self.profile_id}")
-        
+    async def fetch_persona(self) -> bool:
+        """Fetch the persona through the shared MCP session (served locally while it is fresh)."""
         try:
-            # Step 1: GET request to obtain session ID
-            print("Getting session ID...")
-            response = requests.get(
-                self.mcp_server_url,
-                headers={"Accept": "text/event-stream"},
-                timeout=10
-            )
-            
-            # Extract session ID from headers
-            self.session_id = response.headers.get('mcp-session-id')
-            if self.session_id:
-                print(f"✓ Session ID: {self.session_id[:20]}...")
-            else:
-                print("⚠ No session ID in headers")
-                return False
-            
-            # Step 2: Initialize with session ID
-            print("Initializing MCP session...")
-            init_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "initialize",
-                "params": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {},
-                    "clientInfo": {
-                        "name": "emotional-chatbot-gemini",
-                        "version": "1.0.0"
-                    }
-                }
-            }
-            
-            init_response = requests.post(
-                self.mcp_server_url,
-                json=init_payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json, text/event-stream",
-                    "mcp-session-id": self.session_id
-                },
-                timeout=10
-            )
-            
-            print(f"Initialize status: {init_response.status_code}")
-            if init_response.status_code == 200:
-                print("✓ Session initialized")
-            
-            # Step 3: Call the tool with session ID
-            print(f"Calling tool with profile {self.profile_id}...")
-            tool_payload = {
-                "jsonrpc": "2.0",
-                "id": 2,
-                "method": "tools/call",
-                "params": {
-                    "name": "get_agent_contract_from_link",
-                    "arguments": {
-                        "profile": self.profile_id
-                    }
-                }
-            }
-            
-            tool_response = requests.post(
-                self.mcp_server_url,
-                json=tool_payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json, text/event-stream",
-                    "mcp-session-id": self.session_id
-                },
-                timeout=30
-            )
-            
-            print(f"Tool call status: {tool_response.status_code}")
-            
-            if tool_response.status_code == 200:
-                response_text = tool_response.text
-                print(f"Response preview: {response_text[:200]}")
-                
-                # Parse SSE format (event: message \n data: {...})
-                data = None
-                for line in response_text.split('\n'):
-                    if line.startswith('data: '):
-                        json_str = line[6:]  # Remove "data: " prefix
-                        data = json.loads(json_str)
-                        break
-                
-                if not data:
-                    print("Could not parse SSE response")
-                    return False
-                
-                # Extract contract from response
-                if "result" in data:
-                    result = data["result"]
-                    content = result.get("content", [])
-                    
-                    for item in content:
-                        if isinstance(item, dict) and "text" in item:
-                            text_data = json.loads(item["text"])
-                            self.persona_contract = text_data.get("contract")
-                            self.agent_name = text_data.get("name", "Assistant")
-                            print(f"✓ Loaded persona: {self.agent_name}")
-                            return True
-                
-                # Fallback: check if response is direct JSON with contract
-                if isinstance(data, dict) and "contract" in data:
-                    self.persona_contract = data.get("contract")
-                    self.agent_name = data.get("name", "Assistant")
-                    print(f"✓ Loaded persona: {self.agent_name}")
-                    return True
-            
-            print(f"Could not extract persona from response")
-            return False
-            
-        except Exception as e:
+            persona = await self.mcp.get_persona(self.profile_id)
+        except (MCPError, httpx.HTTPError) as e:
             print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
             return False
+        if persona.contract != self.persona_contract:
+            self.persona_contract = persona.contract
+            self.agent_name = persona.name
+            self.conversation.system = persona.contract
+            print(f"✓ Loaded persona: {self.agent_name}")
+        return True
 
-    def chat(self, user_message: str, conversation_history: List[Dict] = None) -> str:
-        """Chat with the agent using the persona contract."""
-        
-        # Build the full prompt with persona contract
-        full_prompt = ""
-        
-        # Add persona contract as system instruction
-        if self.persona_contract:
-            full_prompt += f"{self.persona_contract}\n\n"
-        
-        # Add conversation history
-        if conversation_history:
-            for msg in conversation_history:
-                role = msg.get("role", "")
-                content = msg.get("content", "")
-                if role == "user":
-                    full_prompt += f"User: {content}\n"
-                elif role == "assistant":
-                    full_prompt += f"{self.agent_name}: {content}\n"
-        
-        # Add current user message
-        full_prompt += f"User: {user_message}\n{self.agent_name}:"
+    async def close(self) -> None:
+        await self.mcp.aclose()
 
-        try:
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config={
-                    'temperature': 0.7,
-                    'top_p': 1,
-                    'top_k': 1,
-                    'max_output_tokens': 2048,
-                }
-            )
-            
-            return response.text if response.text else "I couldn't generate a response."
-        except Exception as e:
-            return f"Error: {e}"
+    def chat(self, user_message: str) -> ChatStream:
+        """Start a reply to `user_message`; iterate the result to stream it."""
+        return self.conversation.send(user_message)
 
 
-def main():
+async def main():
     """Main function."""
     print("=" * 60)
     print("Emotional Chatbot - Google Gemini + Emotionsin.ai")
@@ -232,6 +100,7 @@ def main():
     print(f"Profile ID: {PROFILE_ID}")
     print()
     
+    chatbot = None
     try:
         chatbot = EmotionalChatbot(
             api_key=GOOGLE_API_KEY,
@@ -239,8 +108,8 @@ def main():
             mcp_server_url=MCP_SERVER_URL
         )
         
-        # Fetch persona with proper session ID handling
-        success = chatbot.fetch_persona_from_mcp()
+        print(f"Fetching persona from {MCP_SERVER_URL}...")
+        success = await chatbot.fetch_persona()
         
         if not success:
             print("\n⚠ Could not load persona. Using default behavior.\n")
@@ -249,10 +118,9 @@ def main():
         print("-" * 60)
         print()
         
-        conversation_history = []
-        
         while True:
-            user_input = input("You: ").strip()
+            # input() in a thread, so the event loop (and the MCP session) stays responsive.
+            user_input = (await asyncio.to_thread(input, "You: ")).strip()
             
             if user_input.lower() in ['quit', 'exit', 'q']:
                 print("\nGoodbye!")
@@ -261,23 +129,30 @@ def main():
             if not user_input:
                 continue
             
-            response = chatbot.chat(user_input, conversation_history)
-            print(f"{chatbot.agent_name}: {response}\n")
-            
-            conversation_history.append({"role": "user", "content": user_input})
-            conversation_history.append({"role": "assistant", "content": response})
-            
-            # Limit history to last 10 exchanges
-            if len(conversation_history) > 20:
-                conversation_history = conversation_history[-20:]
+            # Cheap when nothing changed: a local cache hit, or a not_modified
+            # answer on the open session once the local copy is older than max_age.
+            if success:
+                await chatbot.fetch_persona()
+            
+            print(f"{chatbot.agent_name}: ", end="", flush=True)
+            reply = chatbot.chat(user_input)
+            try:
+                async for piece in reply:
+                    print(piece, end="", flush=True)
+            except Exception as e:
+                print(f"Error: {e}", end="")
+            print(f"\n[{reply.stats}]\n")
                 
     except KeyboardInterrupt:
         print("\n\nGoodbye!")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        if chatbot is not None:
+            await chatbot.close()
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
 
@@ -0,0 +1,17 @@
+"""
+Shared client for the demo agents: one persistent MCP session to the
+Emotionsin.ai server, incremental SSE parsing and a local contract cache,
+plus a streaming chat engine that works with any model provider and
+keeps each conversation within a token budget.
+"""
+
+from .chat import ChatEngine, ChatProvider, ChatStats, ChatStream, Conversation, Usage
+from .client import DEFAULT_SERVER_URL, EmotionsinClient, MCPError, Persona
+from .history import ConversationHistory, estimate_tokens, summarize_turns
+from .sse import SSEEvent, SSEParser
+
+__all__ = [
+    "DEFAULT_SERVER_URL", "EmotionsinClient", "MCPError", "Persona", "SSEEvent", "SSEParser",
+    "ChatEngine", "ChatProvider", "ChatStats", "ChatStream", "Conversation", "Usage",
+    "ConversationHistory", "estimate_tokens", "summarize_turns",
+]
@@ -0,0 +1,236 @@
+"""
+Provider-agnostic streaming chat engine for the demo agents.
+
+A provider turns `(system, messages)` into an async stream of text
+pieces. The engine runs that stream without blocking the event loop,
+hands each piece to the caller as it arrives and measures the turn:
+time to first token (TTFT), output tokens and tokens/sec. One engine
+serves any number of concurrent conversations; `max_concurrent` caps how
+many provider streams are open at once.
+
+    engine = ChatEngine(OpenAIProvider(api_key))
+    conversation = Conversation(engine, system=persona.contract, budget=4000)
+    reply = conversation.send("Hello!")
+    async for piece in reply:
+        print(piece, end="", flush=True)
+    print(reply.stats)
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+from .history import ConversationHistory, estimate_tokens
+
+
+@dataclass
+class Usage:
+    """Yielded by a provider stream when the API reports exact token counts."""
+    output_tokens: int
+    input_tokens: Optional[int] = None
+
+
+@dataclass
+class ChatStats:
+    provider: str
+    ttft: Optional[float] = None  # seconds from request to first text piece
+    duration: float = 0.0  # seconds from request to end of stream
+    output_tokens: int = 0
+    exact: bool = False  # False: output_tokens counts streamed pieces, not reported tokens
+    prompt_tokens: Optional[int] = None  # as reported by the API, if it does
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation rate after the first token, so slow TTFT does not hide a fast decoder."""
+        if self.ttft is None or self.output_tokens < 2 or self.duration <= self.ttft:
+            return 0.0
+        return (self.output_tokens - 1) / (self.duration - self.ttft)
+
+    def __str__(self) -> str:
+        ttft = f"{self.ttft * 1000:.0f} ms" if self.ttft is not None else "-"
+        approx = "" if self.exact else "~"
+        prompt = f"prompt {self.prompt_tokens} tokens, " if self.prompt_tokens is not None else ""
+        return (f"{prompt}TTFT {ttft}, {approx}{self.output_tokens} tokens in {self.duration:.2f} s "
+                f"({approx}{self.tokens_per_second:.1f} tokens/s)")
+
+
+class ChatProvider:
+    """
+    Base class for model providers. `stream` yields text pieces in order
+    and, optionally, one `Usage` with exact token counts.
+
+    `system` is the agent's instruction (the persona contract); providers
+    pass it through the API's own system-instruction field rather than as
+    part of the conversation. `messages` may start with a "system" message
+    holding a summary of earlier turns.
+    """
+
+    name = "provider"
+
+    def count_tokens(self, text: str) -> int:
+        """Token count used for history budgets; override with the model's tokenizer if there is one."""
+        return estimate_tokens(text)
+
+    def stream(self, system: Optional[str], messages: List[Dict[str, str]]) -> AsyncIterator[Union[str, Usage]]:
+        raise NotImplementedError
+
+
+class ChatStream:
+    """
+    One streamed reply. Iterate it (once) for the text pieces; afterwards
+    `text` holds the whole reply and `stats` its measurements.
+    `on_complete(text)` runs once the reply has streamed to the end,
+    `on_error()` if it does not: it failed, was cancelled or was abandoned.
+    """
+
+    def __init__(self, engine: "ChatEngine", system: Optional[str], messages: List[Dict[str, str]],
+                 on_complete: Optional[Callable[[str], None]] = None,
+                 on_error: Optional[Callable[[], object]] = None):
+        self._engine = engine
+        self._system = system
+        self._messages = messages
+        self._on_complete = on_complete
+        self._on_error = on_error
+        self._started = False
+        self.text = ""
+        self.stats = ChatStats(provider=engine.provider.name)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        if self._started:
+            raise RuntimeError("A ChatStream can only be consumed once")
+        self._started = True
+        return self._run()
+
+    async def collect(self) -> str:
+        """Consume the stream and return the whole reply."""
+        async for _ in self:
+            pass
+        return self.text
+
+    async def _run(self) -> AsyncIterator[str]:
+        engine = self._engine
+        pieces: List[str] = []
+        completed = False
+        started = time.perf_counter()  # before the slot: time queued for one counts towards TTFT
+        try:
+            async with engine._slots:
+                engine.in_flight += 1
+                try:
+                    async for item in engine.provider.stream(self._system, self._messages):
+                        if isinstance(item, Usage):
+                            self.stats.output_tokens = item.output_tokens
+                            self.stats.exact = True
+                            self.stats.prompt_tokens = item.input_tokens
+                            continue
+                        if not item:
+                            continue
+                        if self.stats.ttft is None:
+                            self.stats.ttft = time.perf_counter() - started
+                        pieces.append(item)
+                        if not self.stats.exact:
+                            self.stats.output_tokens += 1
+                        yield item
+                except Exception:
+                    engine.errors += 1
+                    raise
+                finally:
+                    engine.in_flight -= 1
+                    self.stats.duration = time.perf_counter() - started
+            self.text = "".join(pieces)
+            engine._record(self.stats)
+            completed = True
+        finally:
+            # Failed, cancelled or abandoned by the consumer (e.g. `break`, `aclose()`).
+            if not completed and self._on_error is not None:
+                self._on_error()
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+
+class ChatEngine:
+    def __init__(self, provider: ChatProvider, max_concurrent: int = 32):
+        self.provider = provider
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.turns = 0
+        self.errors = 0
+        self.output_tokens = 0
+        self._ttft_total = 0.0
+        self._generation_time = 0.0
+
+    def stream(self, system: Optional[str], messages: List[Dict[str, str]],
+               on_complete: Optional[Callable[[str], None]] = None,
+               on_error: Optional[Callable[[], object]] = None) -> ChatStream:
+        return ChatStream(self, system, messages, on_complete, on_error)
+
+    async def complete(self, system: Optional[str], messages: List[Dict[str, str]]) -> ChatStream:
+        """Run a turn to the end; the returned stream has `text` and `stats` filled in."""
+        reply = self.stream(system, messages)
+        await reply.collect()
+        return reply
+
+    def _record(self, stats: ChatStats) -> None:
+        self.turns += 1
+        self.output_tokens += stats.output_tokens
+        if stats.ttft is not None:
+            self._ttft_total += stats.ttft
+            self._generation_time += stats.duration - stats.ttft
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "turns": self.turns,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "output_tokens": self.output_tokens,
+            "avg_ttft": self._ttft_total / self.turns if self.turns else 0.0,
+            "tokens_per_second": self.output_tokens / self._generation_time if self._generation_time else 0.0,
+        }
+
+
+class Conversation:
+    """
+    One conversation on top of a shared engine. `budget` caps the prompt in
+    tokens: the system instruction (counted once, when it is set) plus the
+    history window, whose oldest turns are evicted or, with `summarize`,
+    folded into a running summary (see `history.ConversationHistory`).
+
+    The user message is added when the turn starts and the reply once it
+    has streamed to the end; if the reply does not get there (it fails, is
+    cancelled or the caller stops reading it), the user message is removed
+    again.
+    """
+
+    def __init__(
+        self,
+        engine: ChatEngine,
+        system: Optional[str] = None,
+        budget: int = 4000,
+        summarize: Optional[Callable[[str, List[Dict[str, str]]], str]] = None,
+        min_history_budget: int = 256,
+    ):
+        self.engine = engine
+        self.budget = budget
+        self.min_history_budget = min_history_budget  # kept even if the system instruction alone fills `budget`
+        self.history = ConversationHistory(budget, count_tokens=engine.provider.count_tokens, summarize=summarize)
+        self.system = system
+
+    @property
+    def system(self) -> Optional[str]:
+        return self._system
+
+    @system.setter
+    def system(self, system: Optional[str]) -> None:
+        self._system = system
+        system_tokens = self.engine.provider.count_tokens(system) if system else 0
+        self.history.budget = max(self.min_history_budget, self.budget - system_tokens)
+
+    def send(self, user_message: str) -> ChatStream:
+        message = self.history.append("user", user_message)
+        messages = self.history.messages()
+        return self.engine.stream(
+            self._system,
+            messages,
+            on_complete=lambda text: self.history.append("assistant", text),
+            on_error=lambda: self.history.remove(message),
+        )
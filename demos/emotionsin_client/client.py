@@ -0,0 +1,222 @@
+"""
+Async client for the Emotionsin.ai MCP server.
+
+One `EmotionsinClient` keeps a single MCP session (and its pooled HTTP
+connection) open and reuses it for every persona fetch. Contracts are
+cached locally; once `max_age` has passed, they are revalidated with the
+server's `if_none_match` check, so an unchanged contract costs a tiny
+`not_modified` reply instead of a full download.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .sse import SSEParser
+
+PROTOCOL_VERSION = "2025-06-18"
+DEFAULT_SERVER_URL = "https://emotionsinai-mcp-server-572436270187.europe-west1.run.app/mcp"
+
+
+class MCPError(RuntimeError):
+    """Raised when the server answers with a JSON-RPC error or a failed tool call."""
+
+
+@dataclass
+class Persona:
+    profile_id: str
+    name: str
+    contract: str
+    contract_hash: Optional[str]
+    fetched_at: float  # time.monotonic() of the last fetch or successful revalidation
+
+
+class EmotionsinClient:
+    """
+    Usage:
+
+        async with EmotionsinClient(server_url) as client:
+            persona = await client.get_persona(profile_id)
+
+    Safe to share between concurrent tasks; concurrent fetches of the same
+    profile share one request.
+    """
+
+    def __init__(
+        self,
+        server_url: str = DEFAULT_SERVER_URL,
+        max_age: float = 300.0,
+        timeout: float = 30.0,
+        client_name: str = "emotionsin-client",
+        http: Optional[httpx.AsyncClient] = None,
+    ):
+        self.server_url = server_url
+        self.max_age = max_age  # seconds a cached contract is used without asking the server
+        self.client_name = client_name
+        self._http = http or httpx.AsyncClient(timeout=timeout)
+        self._owns_http = http is None
+        self._ids = itertools.count(1)
+        self._session_id: Optional[str] = None
+        self._protocol_version: Optional[str] = None
+        self._init_lock = asyncio.Lock()
+        self._personas: Dict[str, Persona] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.requests = 0
+
+    async def __aenter__(self) -> "EmotionsinClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    @property
+    def connected(self) -> bool:
+        return self._protocol_version is not None
+
+    async def connect(self) -> None:
+        """Run the MCP handshake once; later calls reuse the session."""
+        async with self._init_lock:
+            if self.connected:
+                return
+            # No reconnect-on-404 in here: it would re-enter connect() and wait on the lock forever.
+            result = await self._post("initialize", {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": self.client_name, "version": "1.0.0"},
+            }, retry=False)
+            self._protocol_version = result.get("protocolVersion", PROTOCOL_VERSION)
+            await self._post("notifications/initialized", None, notification=True, retry=False)
+
+    async def aclose(self) -> None:
+        if self._session_id is not None:
+            try:
+                await self._http.delete(self.server_url, headers=self._headers())
+            except httpx.HTTPError:
+                pass
+            self._session_id = None
+        self._protocol_version = None
+        if self._owns_http:
+            await self._http.aclose()
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a tool and return its structured (JSON) result."""
+        await self.connect()
+        result = await self._post("tools/call", {"name": name, "arguments": arguments})
+        if result.get("isError"):
+            raise MCPError(_text_content(result) or f"Tool {name} failed")
+        if result.get("structuredContent") is not None:
+            return result["structuredContent"]
+        return json.loads(_text_content(result) or "{}")
+
+    async def get_persona(self, profile_id: str, refresh: bool = False) -> Persona:
+        """
+        Return the persona for `profile_id`: from the local cache while it is
+        younger than `max_age` (unless `refresh`), otherwise revalidated or
+        fetched through the open session.
+        """
+        cached = self._personas.get(profile_id)
+        if cached is not None and not refresh and time.monotonic() - cached.fetched_at < self.max_age:
+            return cached
+        task = self._inflight.get(profile_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_persona(profile_id))
+            self._inflight[profile_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(profile_id, None))
+        return await asyncio.shield(task)
+
+    def cached_persona(self, profile_id: str) -> Optional[Persona]:
+        return self._personas.get(profile_id)
+
+    async def _fetch_persona(self, profile_id: str) -> Persona:
+        cached = self._personas.get(profile_id)
+        arguments: Dict[str, Any] = {"profile": profile_id, "include_raw": False}
+        if cached is not None and cached.contract_hash:
+            arguments["if_none_match"] = cached.contract_hash
+        data = await self.call_tool("get_agent_contract_from_link", arguments)
+        if data.get("not_modified") and cached is not None:
+            cached.fetched_at = time.monotonic()
+            return cached
+        persona = Persona(
+            profile_id=profile_id,
+            name=data.get("name") or "Assistant",
+            contract=data["contract"],
+            contract_hash=data.get("contract_hash"),
+            fetched_at=time.monotonic(),
+        )
+        self._personas[profile_id] = persona
+        return persona
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Accept": "application/json, text/event-stream"}
+        if self._session_id:
+            headers["mcp-session-id"] = self._session_id
+        if self._protocol_version:
+            headers["mcp-protocol-version"] = self._protocol_version
+        return headers
+
+    async def _post(
+        self, method: str, params: Optional[Dict[str, Any]], notification: bool = False, retry: bool = True
+    ) -> Dict[str, Any]:
+        """Send one JSON-RPC message; with `retry`, start a new session once if the server lost ours."""
+        message: Dict[str, Any] = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        request_id = None
+        if not notification:
+            request_id = next(self._ids)
+            message["id"] = request_id
+
+        for attempt in range(2):
+            self.requests += 1
+            async with self._http.stream("POST", self.server_url, json=message, headers=self._headers()) as r:
+                if retry and r.status_code == 404 and self._session_id and attempt == 0:
+                    # The server dropped our session (restart, idle timeout): start a new one.
+                    await r.aread()
+                    self._session_id = None
+                    self._protocol_version = None
+                    await self.connect()
+                    continue
+                if r.status_code >= 400:
+                    await r.aread()
+                    raise MCPError(f"{method} failed with HTTP {r.status_code}: {r.text[:200]}")
+                if "mcp-session-id" in r.headers:
+                    self._session_id = r.headers["mcp-session-id"]
+                if notification:
+                    return {}
+                response = await _read_response(r, request_id)
+            if "error" in response:
+                error = response["error"]
+                raise MCPError(f"{method} failed: {error.get('message')} ({error.get('code')})")
+            return response.get("result", {})
+        raise MCPError(f"{method} failed: session could not be re-established")
+
+
+async def _read_response(r: httpx.Response, request_id: int) -> Dict[str, Any]:
+    """The JSON-RPC response for `request_id`, from a JSON or SSE body."""
+    if not r.headers.get("content-type", "").startswith("text/event-stream"):
+        return json.loads(await r.aread())
+    parser = SSEParser()
+    async for line in r.aiter_lines():
+        event = parser.feed_line(line.rstrip("\r"))
+        if event is None:
+            continue
+        message = json.loads(event.data)
+        # Progress and log notifications can precede the response.
+        if message.get("id") == request_id:
+            return message
+    event = parser.flush()
+    if event is not None:
+        message = json.loads(event.data)
+        if message.get("id") == request_id:
+            return message
+    raise MCPError(f"Stream ended without a response to request {request_id}")
+
+
+def _text_content(result: Dict[str, Any]) -> str:
+    return "".join(item.get("text", "") for item in result.get("content", []) if item.get("type") == "text")
@@ -0,0 +1,105 @@
+"""
+Local stand-in for a model provider, for the chat engine.
+
+Streams a canned (or computed) reply word by word with a configurable
+time to first token and decode rate, without an API key or network.
+It can also load-test the engine with many concurrent conversations:
+
+    python -m emotionsin_client.fake_provider --conversations 200 --turns 3
+
+(run from the `demos` directory).
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+from .chat import ChatEngine, ChatProvider, Conversation, Usage
+
+
+class FakeProvider(ChatProvider):
+    name = "fake"
+
+    def __init__(
+        self,
+        reply: Union[str, Callable[[Optional[str], List[Dict[str, str]]], str], None] = None,
+        ttft: float = 0.2,
+        tokens_per_second: float = 50.0,
+        fail_rate: float = 0.0,
+    ):
+        self.reply = reply  # None echoes the last user message
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.fail_rate = fail_rate  # fraction of turns that raise after the first token
+        self.requests = 0
+        self.last_system: Optional[str] = None
+        self.last_messages: List[Dict[str, str]] = []
+
+    def _reply(self, system: Optional[str], messages: List[Dict[str, str]]) -> str:
+        if callable(self.reply):
+            return self.reply(system, messages)
+        if self.reply is not None:
+            return self.reply
+        last = messages[-1]["content"] if messages else ""
+        return f"You said: {last}"
+
+    async def stream(self, system: Optional[str], messages: List[Dict[str, str]]) -> AsyncIterator[Union[str, Usage]]:
+        self.requests += 1
+        self.last_system = system
+        self.last_messages = list(messages)
+        fail = random.random() < self.fail_rate
+        words = self._reply(system, messages).split(" ")
+        await asyncio.sleep(self.ttft)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield word if i == 0 else " " + word
+            if fail:
+                raise ConnectionError("fake provider failure")
+        yield Usage(len(words))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many concurrent conversations against a fake provider")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-words", type=int, default=40)
+    parser.add_argument("--max-concurrent", type=int, default=64, help="engine limit on open provider streams")
+    args = parser.parse_args()
+
+    provider = FakeProvider(
+        reply=" ".join(["word"] * args.reply_words),
+        ttft=args.ttft_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+    )
+    engine = ChatEngine(provider, max_concurrent=args.max_concurrent)
+
+    async def converse(n: int) -> List[float]:
+        conversation = Conversation(engine, system=f"You are agent {n}.")
+        ttfts = []
+        for turn in range(args.turns):
+            reply = conversation.send(f"Message {turn}")
+            await reply.collect()
+            ttfts.append(reply.stats.ttft)
+        return ttfts
+
+    async def run() -> None:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(converse(n) for n in range(args.conversations)))
+        elapsed = time.perf_counter() - started
+        ttfts = sorted(t for ttft in results for t in ttft)
+        stats = engine.stats()
+        print(f"{stats['turns']} turns in {elapsed:.2f} s, {stats['output_tokens']} tokens "
+              f"({stats['output_tokens'] / elapsed:.0f} tokens/s across all conversations)")
+        print(f"TTFT p50 {ttfts[len(ttfts) // 2] * 1000:.0f} ms, p99 {ttfts[int(len(ttfts) * 0.99)] * 1000:.0f} ms; "
+              f"per stream {stats['tokens_per_second']:.1f} tokens/s")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
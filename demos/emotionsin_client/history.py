@@ -0,0 +1,139 @@
+"""
+Token-budgeted conversation history.
+
+Every message is counted once, when it is added, and the window keeps a
+running total, so fitting the history into its budget costs nothing per
+turn beyond the messages actually evicted. When the total goes over the
+budget, the oldest turns are evicted (a user message together with the
+reply to it). They can be folded into a short running summary, which
+stays in the window as one message, so the agent still knows what was
+said earlier.
+"""
+
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# Fixed cost of one message in the prompt (role, separators), in tokens.
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def summarize_turns(summary: str, evicted: List[Dict[str, str]], max_chars: int = 160) -> str:
+    """
+    Cheap extractive summarizer: the start of every evicted message, one per
+    line, appended to the existing summary. Needs no model call.
+    """
+    lines = [summary] if summary else []
+    for message in evicted:
+        text = " ".join(message["content"].split())
+        if len(text) > max_chars:
+            text = text[:max_chars].rstrip() + "..."
+        lines.append(f"{message['role']}: {text}")
+    return "\n".join(lines)
+
+
+class ConversationHistory:
+    """
+    Messages of one conversation, kept under `budget` tokens.
+
+    `summarize(summary, evicted) -> summary` is called with the turns being
+    evicted; without it they are dropped. The summary is limited to
+    `summary_budget` tokens (default: a quarter of `budget`; oldest lines go
+    first) and counts towards the budget like any message.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        summarize: Optional[Callable[[str, List[Dict[str, str]]], str]] = None,
+        summary_budget: Optional[int] = None,
+    ):
+        self.budget = budget
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self._summary_budget = summary_budget
+        self._messages: Deque[Tuple[Dict[str, str], int]] = deque()  # (message, tokens)
+        self._message_tokens = 0
+        self.summary = ""
+        self._summary_tokens = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def summary_budget(self) -> int:
+        return self._summary_budget if self._summary_budget is not None else self.budget // 4
+
+    @property
+    def tokens(self) -> int:
+        return self._message_tokens + self._summary_tokens
+
+    def append(self, role: str, content: str) -> Dict[str, str]:
+        """Add a message; returns it, for a later `remove()`."""
+        message = {"role": role, "content": content}
+        tokens = self.count_tokens(content) + MESSAGE_OVERHEAD
+        self._messages.append((message, tokens))
+        self._message_tokens += tokens
+        self._fit()
+        return message
+
+    def pop(self) -> Dict[str, str]:
+        """Remove and return the newest message."""
+        message, tokens = self._messages.pop()
+        self._message_tokens -= tokens
+        return message
+
+    def remove(self, message: Dict[str, str]) -> bool:
+        """
+        Remove `message` (as returned by `append`), e.g. a user message whose
+        reply failed. Returns False if it is no longer in the window.
+        """
+        for i, (kept, tokens) in enumerate(self._messages):
+            if kept is message:
+                del self._messages[i]
+                self._message_tokens -= tokens
+                return True
+        return False
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The window to send: the summary (as a system message) and the kept messages."""
+        window = [message for message, _ in self._messages]
+        if self.summary:
+            window.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return window
+
+    def _fit(self) -> None:
+        # The newest message always stays, even on its own over the budget.
+        while self.tokens > self.budget and len(self._messages) > 1:
+            evicted = [self._evict_oldest()]
+            # Evict whole turns, so the window never starts with a reply.
+            if self._messages[0][0]["role"] == "assistant" and len(self._messages) > 1:
+                evicted.append(self._evict_oldest())
+            if self.summarize is not None:
+                # Summarize turn by turn: the summary itself takes space in the window.
+                self._set_summary(self.summarize(self.summary, evicted))
+
+    def _evict_oldest(self) -> Dict[str, str]:
+        message, tokens = self._messages.popleft()
+        self._message_tokens -= tokens
+        self.evicted += 1
+        return message
+
+    def _set_summary(self, summary: str) -> None:
+        lines = summary.split("\n")
+        tokens = self.count_tokens(summary) + MESSAGE_OVERHEAD
+        while tokens > self.summary_budget and len(lines) > 1:
+            lines.pop(0)
+            summary = "\n".join(lines)
+            tokens = self.count_tokens(summary) + MESSAGE_OVERHEAD
+        self.summary = summary
+        self._summary_tokens = tokens if summary else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"messages": len(self._messages), "tokens": self.tokens, "budget": self.budget, "evicted": self.evicted}
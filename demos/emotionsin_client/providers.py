@@ -0,0 +1,111 @@
+"""
+Streaming chat providers for OpenAI and Google Gemini.
+
+The SDKs are imported when a provider is created, so the package works
+with only the one a demo needs installed. Both use the SDK's async client
+with streaming enabled: pieces are yielded as the API sends them and the
+event loop stays free for other conversations in the meantime.
+"""
+
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from .chat import ChatProvider, Usage
+from .history import estimate_tokens
+
+
+class OpenAIProvider(ChatProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-4", temperature: float = 0.7):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.model = model
+        self.temperature = temperature
+        try:
+            import tiktoken
+
+            self._encoding = tiktoken.encoding_for_model(model)
+        except (ImportError, KeyError):
+            self._encoding = None  # no tokenizer for this model: estimate
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return estimate_tokens(text)
+        return len(self._encoding.encode(text))
+
+    async def stream(self, system: Optional[str], messages: List[Dict[str, str]]) -> AsyncIterator[Union[str, Usage]]:
+        request = ([{"role": "system", "content": system}] if system else []) + messages
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=request,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True},  # last chunk carries the token count
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage is not None:
+                yield Usage(chunk.usage.completion_tokens, chunk.usage.prompt_tokens)
+
+
+class GeminiProvider(ChatProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", generation_config: Optional[Dict] = None):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model
+        self.generation_config = generation_config or {
+            "temperature": 0.7,
+            "top_p": 1,
+            "top_k": 1,
+            "max_output_tokens": 2048,
+        }
+        # The system instruction is fixed per model object; keep one per contract in use.
+        self._models: "OrderedDict[Optional[str], Any]" = OrderedDict()
+
+    def _model(self, system: Optional[str]):
+        model = self._models.get(system)
+        if model is None:
+            model = self._genai.GenerativeModel(self.model_name, system_instruction=system or None)
+            self._models[system] = model
+            if len(self._models) > 16:
+                self._models.popitem(last=False)
+        else:
+            self._models.move_to_end(system)
+        return model
+
+    @staticmethod
+    def _contents(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        contents: List[Dict[str, Any]] = []
+        for message in messages:
+            # Gemini has user and model turns only; a history summary goes in as user context.
+            role = "model" if message["role"] == "assistant" else "user"
+            if contents and contents[-1]["role"] == role:
+                contents[-1]["parts"].append(message["content"])
+            else:
+                contents.append({"role": role, "parts": [message["content"]]})
+        return contents
+
+    async def stream(self, system: Optional[str], messages: List[Dict[str, str]]) -> AsyncIterator[Union[str, Usage]]:
+        response = await self._model(system).generate_content_async(
+            self._contents(messages),
+            generation_config=self.generation_config,
+            stream=True,
+        )
+        usage = None
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                text = ""  # chunk without text parts (e.g. only a finish reason)
+            if text:
+                yield text
+            usage = getattr(chunk, "usage_metadata", None) or usage
+        if usage is not None and usage.candidates_token_count:
+            yield Usage(usage.candidates_token_count, usage.prompt_token_count)
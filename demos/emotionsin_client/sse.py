@@ -0,0 +1,56 @@
+"""
+Incremental parser for `text/event-stream` bodies.
+
+Lines are fed as they arrive, and each complete event is returned as soon
+as its terminating blank line is seen. A caller waiting for one JSON-RPC
+response can therefore stop reading as soon as the response arrives,
+instead of buffering the whole body and splitting it afterwards.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class SSEEvent:
+    event: str = "message"
+    data: str = ""
+    id: Optional[str] = None
+
+
+class SSEParser:
+    """Feed one line at a time (without its line ending); get back completed events."""
+
+    def __init__(self):
+        self._event = ""
+        self._data: list = []
+        self._id: Optional[str] = None
+
+    def feed_line(self, line: str) -> Optional[SSEEvent]:
+        if line == "":
+            return self._dispatch()
+        if line.startswith(":"):
+            return None  # comment / keep-alive
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._id = value
+        return None
+
+    def flush(self) -> Optional[SSEEvent]:
+        """Return a last event the stream ended without a blank line after."""
+        return self._dispatch()
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data:
+            self._event = ""
+            return None
+        event = SSEEvent(event=self._event or "message", data="\n".join(self._data), id=self._id)
+        self._event = ""
+        self._data = []
+        return event
@@ -0,0 +1,137 @@
+# admission.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import metrics
+
+SHED_QUEUE_FULL = "queue_full"
+SHED_TIMEOUT = "timeout"
+
+
+class Overloaded(RuntimeError):
+    """Raised instead of queueing a call the server has no capacity for."""
+
+    def __init__(self, reason: str, queue_timeout: float):
+        self.reason = reason
+        if reason == SHED_QUEUE_FULL:
+            detail = "wait queue is full"
+        else:
+            detail = f"no capacity within {queue_timeout}s"
+        super().__init__(f"Server overloaded ({detail}); retry later")
+
+
+class _KeyLimit:
+    """Per-key semaphore, dropped again once nobody holds or waits for it."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class AdmissionController:
+    """
+    Bounds how many callers may be inside a section at once, overall
+    (`max_concurrent`) and per key (`max_per_key`). Callers over a limit
+    wait in a queue of at most `max_queue` for up to `queue_timeout`
+    seconds; past either bound they get `Overloaded` straight away instead
+    of piling up. A concurrency limit of 0 means unlimited; `max_queue=0`
+    sheds every caller that cannot be admitted at once.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_key: int = 0, max_queue: int = 0, queue_timeout: float = 1.0):
+        self.max_concurrent = max_concurrent
+        self.max_per_key = max_per_key
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._global: Optional[asyncio.Semaphore] = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+        self._keys: Dict[str, _KeyLimit] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = {SHED_QUEUE_FULL: 0, SHED_TIMEOUT: 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._global is not None or self.max_per_key > 0
+
+    @asynccontextmanager
+    async def admit(self, key: str) -> AsyncIterator[bool]:
+        """Hold a slot for `key` for the duration of the block; yields whether the caller had to queue."""
+        if not self.enabled:
+            yield False
+            return
+        limit = self._key_limit(key)
+        try:
+            held, queued = await self._acquire(limit)
+            self.in_flight += 1
+            self.admitted += 1
+            try:
+                yield queued
+            finally:
+                self.in_flight -= 1
+                for semaphore in held:
+                    semaphore.release()
+        finally:
+            if limit is not None:
+                limit.users -= 1
+                if limit.users == 0:
+                    del self._keys[key]
+
+    def _key_limit(self, key: str) -> Optional[_KeyLimit]:
+        if self.max_per_key <= 0:
+            return None
+        limit = self._keys.get(key)
+        if limit is None:
+            limit = self._keys[key] = _KeyLimit(self.max_per_key)
+        limit.users += 1
+        return limit
+
+    async def _acquire(self, limit: Optional[_KeyLimit]) -> Tuple[List[asyncio.Semaphore], bool]:
+        # Per-key first, so a hot key waits on itself instead of holding global slots.
+        semaphores = [s for s in (limit.semaphore if limit else None, self._global) if s is not None]
+        if not any(s.locked() for s in semaphores):
+            for semaphore in semaphores:
+                await semaphore.acquire()  # free, returns without suspending
+            return semaphores, False
+
+        if self.waiting >= self.max_queue:
+            self._shed(SHED_QUEUE_FULL)
+        self.waiting += 1
+        self.queued += 1
+        held: List[asyncio.Semaphore] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout  # one deadline for all the slots
+        try:
+            for semaphore in semaphores:
+                await asyncio.wait_for(semaphore.acquire(), max(0.0, deadline - loop.time()))
+                held.append(semaphore)
+        except asyncio.TimeoutError:
+            for semaphore in held:
+                semaphore.release()
+            self._shed(SHED_TIMEOUT)
+        except BaseException:
+            for semaphore in held:
+                semaphore.release()
+            raise
+        finally:
+            self.waiting -= 1
+        return held, True
+
+    def _shed(self, reason: str) -> None:
+        self.shed[reason] += 1
+        metrics.ADMISSION_SHED.labels(reason).inc()
+        logging.debug("Shedding call: %s (in_flight=%d, waiting=%d)", reason, self.in_flight, self.waiting)
+        raise Overloaded(reason, self.queue_timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed[SHED_QUEUE_FULL],
+            "shed_timeout": self.shed[SHED_TIMEOUT],
+        }
@@ -0,0 +1 @@
+"""Throughput / latency benchmarks for the MCP tools against fake_backend.py."""
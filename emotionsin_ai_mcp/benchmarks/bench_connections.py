@@ -0,0 +1,117 @@
+# benchmarks/bench_connections.py
+"""
+Measure server memory per connected client for each transport.
+
+Starts fake_backend.py and mcp_server.py (MCP_TRANSPORT=both) as
+subprocesses, then:
+  - opens N SSE sessions and keeps them open (each pins server state), and
+  - opens N streamable-HTTP clients against the stateless /mcp endpoint,
+and reports the server's RSS growth per client after one tool call each.
+Linux only (reads /proc/<pid>/status). Run from `emotionsin_ai_mcp`:
+
+    python -m benchmarks.bench_connections --clients 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from benchmarks.bench_tool import SERVER_DIR, _free_port
+
+
+def _rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found")
+
+
+def _wait_for_port(port: int, timeout: float = 15) -> None:
+    import socket
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+async def _measure(url: str, clients: int, server_pid: int) -> Dict[str, Any]:
+    from fastmcp import Client
+
+    await asyncio.sleep(0.5)
+    before = _rss_kb(server_pid)
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(Client(url)) for _ in range(clients)]
+        await asyncio.gather(*(s.call_tool("get_agent_contract_from_link", {"profile": "conn0001"}) for s in sessions))
+        await asyncio.sleep(0.5)
+        during = _rss_kb(server_pid)
+    await asyncio.sleep(1.0)
+    after = _rss_kb(server_pid)
+    return {
+        "url": url,
+        "clients": clients,
+        "rss_before_kb": before,
+        "rss_with_clients_kb": during,
+        "rss_after_close_kb": after,
+        "kb_per_client": round((during - before) / clients, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure server memory per connected MCP client")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    backend_port, server_port = _free_port(), _free_port()
+    env = dict(
+        os.environ,
+        PORT=str(server_port),
+        MCP_TRANSPORT="both",
+        EMOTIONSIN_BACKEND=f"http://127.0.0.1:{backend_port}/profiles/prompt",
+    )
+    procs = [
+        subprocess.Popen([sys.executable, os.path.join(SERVER_DIR, "fake_backend.py"), "--port", str(backend_port)]),
+        subprocess.Popen(
+            [sys.executable, os.path.join(SERVER_DIR, "mcp_server.py")],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+    ]
+    try:
+        _wait_for_port(backend_port)
+        _wait_for_port(server_port)
+        base = f"http://127.0.0.1:{server_port}"
+        urls = (f"{base}/mcp", f"{base}/sse")
+        # One discarded round per transport so allocator/import warm-up is not counted.
+        for url in urls:
+            asyncio.run(_measure(url, args.clients, procs[1].pid))
+        results = []
+        for url in urls:
+            result = asyncio.run(_measure(url, args.clients, procs[1].pid))
+            results.append(result)
+            print(
+                f"{url:<32} {result['kb_per_client']:>8} KiB/client "
+                f"(rss {result['rss_before_kb']} -> {result['rss_with_clients_kb']} -> {result['rss_after_close_kb']} KiB)"
+            )
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# benchmarks/bench_tool.py
+"""
+Benchmark `get_agent_contract_from_link` against a local stand-in backend.
+
+Starts `fake_backend.py` in a subprocess, points EMOTIONSIN_BACKEND at it,
+then calls the tool through an in-memory MCP client at several concurrency
+levels and reports requests/sec, p50/p95/p99 latency, mean payload size
+and peak RSS. Run from the `emotionsin_ai_mcp` directory:
+
+    python -m benchmarks.bench_tool --concurrency 1,10,50 --requests 500
+    python -m benchmarks.bench_tool --no-cache --latency-ms 20 --output results.json
+    python -m benchmarks.bench_tool --save-baseline      # store benchmarks/baseline.json
+    python -m benchmarks.bench_tool                      # compare against it (exit 1 on regression)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(HERE)
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes.
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+
+def start_backend(args) -> subprocess.Popen:
+    port = _free_port()
+    cmd = [
+        sys.executable, os.path.join(SERVER_DIR, "fake_backend.py"),
+        "--port", str(port),
+        "--prompt-size", str(args.prompt_size),
+        "--latency-ms", str(args.latency_ms),
+        "--error-rate", str(args.error_rate),
+    ]
+    proc = subprocess.Popen(cmd)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                break
+        except OSError:
+            time.sleep(0.05)
+    else:
+        proc.kill()
+        raise RuntimeError("fake backend did not start")
+    os.environ["EMOTIONSIN_BACKEND"] = f"http://127.0.0.1:{port}/profiles/prompt"
+    return proc
+
+
+async def run_level(client, tool: str, tool_args: Dict[str, Any], concurrency: int, requests: int, profiles: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    payload_bytes = 0
+    errors = 0
+    next_request = 0
+
+    async def worker() -> None:
+        nonlocal next_request, payload_bytes, errors
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            call_args = dict(tool_args, profile=f"bench{i % profiles:04d}")
+            start = time.perf_counter()
+            result = await client.call_tool(tool, call_args, raise_on_error=False)
+            latencies.append(time.perf_counter() - start)
+            if result.is_error:
+                errors += 1
+            else:
+                payload_bytes += sum(len(getattr(c, "text", "")) for c in result.content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = requests - errors
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "mean_payload_bytes": round(payload_bytes / ok) if ok else 0,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    # Import only after the environment points at the fake backend.
+    sys.path.insert(0, SERVER_DIR)
+    import logging
+    import mcp_server
+    from fastmcp import Client
+
+    logging.getLogger().setLevel(logging.WARNING)
+    tool_args = dict(json.loads(args.tool_args)) if args.tool_args else {}
+
+    levels = []
+    async with Client(mcp_server.mcp) as client:
+        # Warm up imports, the connection pool and (if enabled) the cache.
+        await run_level(client, args.tool, tool_args, 1, min(args.profiles, 20), args.profiles)
+        for concurrency in args.concurrency:
+            level = await run_level(client, args.tool, tool_args, concurrency, args.requests, args.profiles)
+            levels.append(level)
+            print(
+                f"c={concurrency:<4} rps={level['rps']:<9} p50={level['p50_ms']}ms "
+                f"p95={level['p95_ms']}ms p99={level['p99_ms']}ms errors={level['errors']} "
+                f"payload={level['mean_payload_bytes']}B"
+            )
+
+    return {
+        "config": {
+            "tool": args.tool,
+            "tool_args": tool_args,
+            "requests": args.requests,
+            "profiles": args.profiles,
+            "prompt_size": args.prompt_size,
+            "latency_ms": args.latency_ms,
+            "error_rate": args.error_rate,
+            "cache": not args.no_cache,
+            "python": platform.python_version(),
+        },
+        "levels": levels,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    base_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        c = level["concurrency"]
+        if level["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"c={c}: rps {level['rps']} < baseline {base['rps']}")
+        for key in ("p50_ms", "p99_ms"):
+            if level[key] > base[key] * (1 + tolerance):
+                regressions.append(f"c={c}: {key} {level[key]} > baseline {base[key]}")
+    base_rss = baseline.get("peak_rss_mb")
+    if base_rss and results["peak_rss_mb"] > base_rss * (1 + tolerance):
+        regressions.append(f"peak_rss_mb {results['peak_rss_mb']} > baseline {base_rss}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Emotionsin.ai MCP tools against a local fake backend")
+    parser.add_argument("--tool", default="get_agent_contract_from_link")
+    parser.add_argument("--tool-args", default="", help="extra tool arguments as JSON, e.g. '{\"include_raw\": false}'")
+    parser.add_argument("--concurrency", default="1,10,50", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--requests", type=int, default=500, help="tool calls per concurrency level")
+    parser.add_argument("--profiles", type=int, default=20, help="distinct profile IDs to cycle through")
+    parser.add_argument("--prompt-size", type=int, default=2048)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="fake backend latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake backend error rate (0..1)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the profile cache (PROFILE_CACHE_TTL=0)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ["PROFILE_CACHE_TTL"] = "0"
+    backend = start_backend(args)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        backend.terminate()
+        backend.wait()
+
+    print(f"peak RSS: {results['peak_rss_mb']} MB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != results["config"]:
+        print("Warning: baseline was recorded with a different configuration.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("REGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of baseline.")
+
+
+if __name__ == "__main__":
+    main()
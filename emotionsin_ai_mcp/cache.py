@@ -0,0 +1,131 @@
+# cache.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    size: int
+    stored_at: float
+
+
+class ProfileCache:
+    """
+    Bounded in-memory LRU cache keyed by profile ID (or any other string key).
+
+    An entry is "fresh" for `ttl` seconds after it was stored, then "stale"
+    for another `stale_ttl` seconds, during which it can still be served
+    while the caller refreshes it in the background. After that it is
+    "expired": no longer servable, but kept (until LRU pressure evicts it)
+    so its validators can be used to revalidate instead of re-download.
+    Eviction happens when either `max_entries` or `max_bytes` would be
+    exceeded.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_entries: int = 1024, max_bytes: int = 0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # 0 = no byte limit
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Return (value, FRESH | STALE | EXPIRED) or (None, None) when the key
+        is unknown. EXPIRED counts as a miss.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+
+        age = time.monotonic() - entry.stored_at
+        if age <= self.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value, FRESH
+        if age <= self.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return entry.value, STALE
+
+        self.misses += 1
+        return entry.value, EXPIRED
+
+    def state(self, key: str) -> Optional[str]:
+        """FRESH | STALE | EXPIRED for a stored key (None if unknown), without touching counters."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry.stored_at
+        if age <= self.ttl:
+            return FRESH
+        return STALE if age <= self.ttl + self.stale_ttl else EXPIRED
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Return the stored value regardless of age, without touching LRU order or counters."""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value: Any, size: int = 0, age: float = 0.0) -> None:
+        """Store `value`; `age` backdates it, e.g. when loaded from disk."""
+        if not self.enabled:
+            return
+        if self.max_bytes and size > self.max_bytes:
+            # Never cache something that would flush the whole cache
+            self._remove(key)
+            return
+
+        self._remove(key)
+        self._entries[key] = CacheEntry(value=value, size=size, stored_at=time.monotonic() - age)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> bool:
+        return self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
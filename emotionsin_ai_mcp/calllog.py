@@ -0,0 +1,149 @@
+# calllog.py
+"""
+Logging for the tool hot path.
+
+- `configure_logging()` puts every handler behind a queue, so the event
+  loop only enqueues records and a background thread does formatting and
+  I/O. Records are enqueued unformatted; %-style arguments are only
+  rendered by the listener thread.
+- Each tool call emits one structured "tool_call" record with its timings
+  (see `start_call` / `finish_call`, driven by `metrics.track_tool`).
+  Successful calls are sampled at LOG_SAMPLE_RATE; failures are always
+  logged.
+- Deeper code adds per-call fields with `note()`, which is a no-op
+  outside a tool call. Tasks spawned during a call inherit its record;
+  ones that outlive the call `detach()` (or `redirect()`) first.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from config import LOG_ASYNC, LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_RATE
+
+logger = logging.getLogger("emotionsin.calls")
+
+_fields: ContextVar[Optional[Dict[str, Any]]] = ContextVar("call_fields", default=None)
+_listener: Optional[QueueListener] = None
+
+
+class _Fields:
+    """Renders `key=value` pairs only when a text formatter asks for it."""
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return " ".join(f"{k}={v}" for k, v in self.fields.items())
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None)
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if fields is not None:
+            payload["event"] = record.msg.split(" ", 1)[0]
+            payload.update(fields)
+        else:
+            payload["message"] = record.getMessage()
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # The stock QueueHandler formats the message in the calling thread; keep
+    # the record as-is so formatting happens in the listener thread instead.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging() -> None:
+    global _listener
+    if LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every request with its full URL at INFO; the tool_call record covers that.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    handler = logging.StreamHandler()
+    handler.setFormatter(formatter)
+
+    if not LOG_ASYNC:
+        root.handlers = [handler]
+        return
+
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root.handlers = [_DeferredQueueHandler(log_queue)]
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def note(key: str, value: Any) -> None:
+    fields = _fields.get()
+    if fields is not None:
+        fields[key] = value
+
+
+def detach() -> None:
+    """Stop `note()` from writing into the caller's record for the rest of this task."""
+    _fields.set(None)
+
+
+def redirect(fields: Dict[str, Any]) -> None:
+    """Send this task's `note()` calls to `fields` instead of the caller's record."""
+    _fields.set(fields)
+
+
+def update(fields: Dict[str, Any]) -> None:
+    """`note()` every item of `fields`."""
+    current = _fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def start_call(tool: str, **fields: Any) -> Token:
+    return _fields.set(dict(tool=tool, **fields))
+
+
+def finish_call(token: Token, duration: float, error: Optional[BaseException]) -> None:
+    fields = _fields.get()
+    _fields.reset(token)
+    if fields is None:
+        return
+    # Log a copy: the listener thread formats the record later, and tasks
+    # spawned by this call may still hold the original.
+    if error is None:
+        if LOG_SAMPLE_RATE < 1.0 and random.random() >= LOG_SAMPLE_RATE:
+            return
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        fields = dict(fields, outcome="ok", duration_ms=round(duration * 1000, 3))
+        logger.info("tool_call %s", _Fields(fields), extra={"fields": fields})
+    else:
+        fields = dict(fields, outcome="error", duration_ms=round(duration * 1000, 3),
+                      error=f"{type(error).__name__}: {error}")
+        logger.error("tool_call %s", _Fields(fields), extra={"fields": fields})
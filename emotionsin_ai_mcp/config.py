@@ -1,6 +1,90 @@
 import os
+import tempfile
 
 DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "10"))
-REQUIRE_API_KEY = os.environ.get("REQUIRE_API_KEY", "false").lower() == "true"
-API_KEY = os.environ.get("MCP_API_KEY")  # optional, if you want MCP-level auth
-BACKEND_BASE = os.environ.get("EMOTIONSIN_BACKEND", "https://fastapi-sql-isvbqdl2ba-oc.a.run.app/profiles/prompt")
\ No newline at end of file
+API_KEY = os.environ.get("MCP_API_KEY")  # required by POST /profiles/{id}/invalidate; unset rejects every call
+BACKEND_BASE = os.environ.get("EMOTIONSIN_BACKEND", "https://fastapi-sql-isvbqdl2ba-oc.a.run.app/profiles/prompt")
+
+# Shared backend connection pool (one httpx.AsyncClient per process)
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "false").lower() == "true"  # needs `pip install httpx[http2]`
+
+# Backend resilience: retries with jittered backoff, hedging, circuit breaker
+BACKEND_RETRIES = int(os.environ.get("BACKEND_RETRIES", "2"))
+BACKEND_RETRY_BACKOFF = float(os.environ.get("BACKEND_RETRY_BACKOFF", "0.05"))  # seconds, doubled per attempt
+BACKEND_RETRY_BACKOFF_MAX = float(os.environ.get("BACKEND_RETRY_BACKOFF_MAX", "1.0"))
+HEDGE_ENABLED = os.environ.get("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "95"))  # hedge once this latency percentile has passed
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", "0.05"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))  # 0 disables the breaker
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", "30"))
+SERVE_STALE_ON_ERROR = os.environ.get("SERVE_STALE_ON_ERROR", "true").lower() == "true"
+
+# In-process profile cache (PROFILE_CACHE_TTL=0 disables it)
+PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_STALE_TTL = float(os.environ.get("PROFILE_CACHE_STALE_TTL", "3600"))  # serve stale while refreshing
+PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", "1024"))
+PROFILE_CACHE_MAX_BYTES = int(os.environ.get("PROFILE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CONTRACT_CACHE_MAX_ENTRIES = int(os.environ.get("CONTRACT_CACHE_MAX_ENTRIES", "1024"))  # memoized rendered contracts
+PROFILE_STORE_PATH = os.environ.get("PROFILE_STORE_PATH", "")  # optional SQLite file, e.g. /tmp/profiles.db
+# Optional shared cache tier in a Redis-protocol store, e.g. redis://10.0.0.3:6379/0
+# (needs `pip install redis`). The in-process cache then only keeps profiles for
+# SHARED_CACHE_LOCAL_TTL seconds before checking the shared copy again.
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", "")
+SHARED_CACHE_TTL = float(os.environ.get("SHARED_CACHE_TTL", "86400"))  # seconds entries live in the shared store
+SHARED_CACHE_LOCAL_TTL = float(os.environ.get("SHARED_CACHE_LOCAL_TTL", "5"))
+SHARED_CACHE_TIMEOUT = float(os.environ.get("SHARED_CACHE_TIMEOUT", "0.25"))  # per command; failures count as misses
+# How often processes sharing the store pick up each other's invalidations (seconds)
+INVALIDATION_POLL_INTERVAL = float(os.environ.get("INVALIDATION_POLL_INTERVAL", "1"))
+
+# Cold start: profiles loaded (fetched, compiled, cached) before the server
+# starts accepting connections, as a comma-separated list of IDs.
+WARMUP_PROFILES = [p.strip() for p in os.environ.get("WARMUP_PROFILES", "").split(",") if p.strip()]
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", "10"))  # seconds; startup continues after this
+
+# Admission control for backend-bound loads (cache misses); 0 = unlimited.
+# Callers over a limit wait in a bounded queue, then get an "overloaded" error.
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "256"))
+ADMISSION_MAX_PER_PROFILE = int(os.environ.get("ADMISSION_MAX_PER_PROFILE", "64"))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "512"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "2"))  # seconds a caller may wait
+
+# get_agent_contracts batch tool
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "10"))
+BATCH_MAX_PROFILES = int(os.environ.get("BATCH_MAX_PROFILES", "100"))
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"  # Prometheus text at /metrics
+
+# Transport: "sse", "http" (streamable HTTP) or "both"
+MCP_TRANSPORT = os.environ.get("MCP_TRANSPORT", "both").lower()
+MCP_HTTP_PATH = os.environ.get("MCP_HTTP_PATH", "/mcp")
+MCP_STATELESS_HTTP = os.environ.get("MCP_STATELESS_HTTP", "true").lower() == "true"  # no session affinity needed
+MCP_JSON_RESPONSE = os.environ.get("MCP_JSON_RESPONSE", "false").lower() == "true"  # plain JSON instead of an SSE body
+
+# Worker processes; "auto" = one per CPU. Workers share profiles through the
+# SQLite store, which defaults to a local temp file when more than one runs.
+_workers = os.environ.get("MCP_WORKERS", "1").lower()
+MCP_WORKERS = (os.cpu_count() or 1) if _workers == "auto" else max(1, int(_workers))
+MCP_GRACEFUL_TIMEOUT = int(os.environ.get("MCP_GRACEFUL_TIMEOUT", "30"))  # seconds to drain on shutdown/reload
+if MCP_WORKERS > 1 and not PROFILE_STORE_PATH:
+    PROFILE_STORE_PATH = os.path.join(tempfile.gettempdir(), "emotionsin-profiles.db")
+
+# Logging: queue-backed handlers keep log I/O off the event loop; successful
+# tool-call records are sampled, errors are always logged.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()  # "text" or "json"
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "true").lower() == "true"
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))  # share of successful calls logged
+
+# Tracing: spans from the MCP request through backend fetch, JSON decode and
+# contract compile (see tracing.py). Off unless TRACE_SAMPLE_RATE > 0.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))  # share of new traces recorded
+# Standard OpenTelemetry variables; spans are sent as OTLP/HTTP JSON.
+_otlp_base = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "").rstrip("/")
+OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or (f"{_otlp_base}/v1/traces" if _otlp_base else "")
+OTLP_HEADERS = os.environ.get("OTEL_EXPORTER_OTLP_HEADERS", "")  # "key=value,key2=value2"
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "otlp" if OTLP_ENDPOINT else "file").lower()  # "file", "memory" or "otlp"
+TRACE_FILE = os.environ.get("TRACE_FILE", os.path.join(tempfile.gettempdir(), "emotionsin-traces.jsonl"))
+TRACE_SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "emotionsin-mcp")
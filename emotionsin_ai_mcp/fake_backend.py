@@ -0,0 +1,181 @@
+# fake_backend.py
+"""
+Local stand-in for the Emotionsin.ai profile backend.
+
+Serves `GET /profiles/prompt?id=...` with the same JSON shape as the real
+service, plus `ETag` / `Last-Modified` validators and `304 Not Modified`
+responses to conditional requests. Use it to exercise the MCP server
+without touching the real backend:
+
+    python fake_backend.py --port 8001
+    EMOTIONSIN_BACKEND=http://127.0.0.1:8001/profiles/prompt python mcp_server.py
+
+`POST /profiles/prompt?id=...` with a JSON body replaces a profile (and
+its ETag), which is handy for testing refresh behaviour. With
+`--invalidate-url` it then notifies the MCP server, like the real backend.
+`GET /stats` returns request counters.
+
+Response size, added latency, slow-request (tail) rate and error rate
+can be configured to simulate a slow or flaky backend
+(see `--help`); `POST /fault` changes them at runtime.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from email.utils import formatdate
+from typing import Any, Dict
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+class FakeProfileBackend:
+    def __init__(
+        self,
+        prompt_size: int = 2048,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        invalidate_url: str = "",
+        invalidate_key: str = "",
+    ):
+        self.prompt_size = prompt_size
+        self.latency = latency  # seconds added to every profile GET
+        self.jitter = jitter  # +/- uniform seconds on top of `latency`
+        self.error_rate = error_rate  # share of profile GETs answered with 503
+        self.slow_rate = slow_rate  # share of profile GETs delayed by `slow_latency` (tail latency)
+        self.slow_latency = slow_latency
+        # e.g. http://127.0.0.1:8080/profiles/{id}/invalidate?prefetch=true
+        self.invalidate_url = invalidate_url
+        self.invalidate_key = invalidate_key
+        self.healthy = True  # POST /fault {"healthy": false} makes every profile GET fail
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "not_found": 0, "errors": 0}
+
+    def _default_profile(self, profile_id: str) -> Dict[str, Any]:
+        filler = "Stay warm, curious and concise. "
+        prompt = (filler * (self.prompt_size // len(filler) + 1))[: self.prompt_size]
+        return {"id": profile_id, "name": f"Agent {profile_id[:8]}", "prompt": prompt}
+
+    def put(self, profile_id: str, profile: Dict[str, Any]) -> None:
+        body = json.dumps(profile).encode()
+        self.profiles[profile_id] = {
+            "body": body,
+            "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            "last_modified": formatdate(time.time(), usegmt=True),
+        }
+
+    def get(self, profile_id: str) -> Dict[str, Any]:
+        if profile_id not in self.profiles:
+            self.put(profile_id, self._default_profile(profile_id))
+        return self.profiles[profile_id]
+
+    async def handle_get(self, request: Request) -> Response:
+        self.stats["requests"] += 1
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not self.healthy or (self.error_rate and random.random() < self.error_rate):
+            self.stats["errors"] += 1
+            return JSONResponse({"detail": "injected failure"}, status_code=503)
+
+        profile_id = request.query_params.get("id", "")
+        if not profile_id or profile_id.startswith("missing"):
+            self.stats["not_found"] += 1
+            return JSONResponse({}, status_code=200)  # the real backend answers empty JSON
+
+        entry = self.get(profile_id)
+        validators = {"ETag": entry["etag"], "Last-Modified": entry["last_modified"]}
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if (if_none_match and if_none_match == entry["etag"]) or (
+            not if_none_match and if_modified_since == entry["last_modified"]
+        ):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=validators)
+
+        self.stats["ok"] += 1
+        return Response(entry["body"], media_type="application/json", headers=validators)
+
+    async def handle_post(self, request: Request) -> Response:
+        profile_id = request.query_params.get("id", "")
+        profile = await request.json()
+        profile.setdefault("id", profile_id)
+        self.put(profile_id, profile)
+        if self.invalidate_url:
+            await self._notify(profile_id)
+        return JSONResponse({"id": profile_id, "etag": self.profiles[profile_id]["etag"]})
+
+    async def _notify(self, profile_id: str) -> None:
+        import httpx
+
+        headers = {"Authorization": f"Bearer {self.invalidate_key}"} if self.invalidate_key else {}
+        async with httpx.AsyncClient() as client:
+            try:
+                r = await client.post(self.invalidate_url.format(id=profile_id), headers=headers)
+                r.raise_for_status()
+            except httpx.HTTPError as e:
+                logging.warning("Invalidation of %s failed: %s: %s", profile_id, type(e).__name__, e)
+
+    async def handle_stats(self, request: Request) -> Response:
+        return JSONResponse(self.stats)
+
+    async def handle_fault(self, request: Request) -> Response:
+        """Change fault injection at runtime, e.g. {"healthy": false, "error_rate": 0.5}."""
+        changes = await request.json()
+        for key in ("healthy", "error_rate", "slow_rate", "slow_latency", "latency"):
+            if key in changes:
+                setattr(self, key, changes[key])
+        return JSONResponse({"ok": True})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/profiles/prompt", self.handle_get, methods=["GET"]),
+            Route("/profiles/prompt", self.handle_post, methods=["POST"]),
+            Route("/stats", self.handle_stats, methods=["GET"]),
+            Route("/fault", self.handle_fault, methods=["POST"]),
+        ])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Emotionsin.ai profile backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--prompt-size", type=int, default=2048, help="prompt length in characters")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added to every profile GET")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter on top of --latency-ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of profile GETs answered with 503 (0..1)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of profile GETs delayed by --slow-ms (0..1)")
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    parser.add_argument("--invalidate-url", default="", help="POSTed after a profile is edited; {id} is replaced")
+    parser.add_argument("--invalidate-key", default="", help="bearer token sent with --invalidate-url")
+    args = parser.parse_args()
+
+    backend = FakeProfileBackend(
+        prompt_size=args.prompt_size,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_ms / 1000,
+        invalidate_url=args.invalidate_url,
+        invalidate_key=args.invalidate_key,
+    )
+    uvicorn.run(backend.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
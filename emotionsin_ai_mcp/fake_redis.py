@@ -0,0 +1,152 @@
+# fake_redis.py
+"""
+Local stand-in for a Redis-protocol store, for the shared cache tier.
+
+Speaks enough RESP2 for `SharedCache` (GET, SET with EX/PX, MGET, DEL,
+EXISTS, PING, FLUSHALL, DBSIZE and the `CLIENT SETINFO` the `redis`
+client sends on connect) on a real TCP port, so the server can be run
+and benchmarked against a shared cache without a live Redis:
+
+    python fake_redis.py --port 6380
+    SHARED_CACHE_URL=redis://127.0.0.1:6380/0 python mcp_server.py
+
+It can also run inside the current event loop (`await FakeRedis().start()`
+returns the port). `--latency-ms` adds a delay to every round trip, to
+see what pipelining saves on a batch lookup.
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRedis:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency  # seconds added per round trip (a pipelined batch is one)
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}  # key -> (value, expires_at)
+        self.commands = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.data[key]
+            return None
+        return value
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        buffer = b""
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                replies = []
+                while True:
+                    command, buffer = _parse_command(buffer)
+                    if command is None:
+                        break
+                    replies.append(self.execute(command))
+                if replies:
+                    # One round trip per batch: pipelined commands share the delay.
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    writer.write(b"".join(replies))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def execute(self, command: List[bytes]) -> bytes:
+        self.commands += 1
+        name, args = command[0].upper(), command[1:]
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name in (b"CLIENT", b"SELECT"):
+            return b"+OK\r\n"
+        if name == b"GET":
+            return _bulk(self._get(args[0]))
+        if name == b"MGET":
+            return b"*%d\r\n" % len(args) + b"".join(_bulk(self._get(key)) for key in args)
+        if name == b"SET":
+            expires_at = None
+            options = [a.upper() for a in args[2:]]
+            if b"EX" in options:
+                expires_at = time.monotonic() + float(args[2 + options.index(b"EX") + 1])
+            elif b"PX" in options:
+                expires_at = time.monotonic() + float(args[2 + options.index(b"PX") + 1]) / 1000
+            self.data[args[0]] = (args[1], expires_at)
+            return b"+OK\r\n"
+        if name == b"DEL":
+            return b":%d\r\n" % sum(1 for key in args if self.data.pop(key, None) is not None)
+        if name == b"EXISTS":
+            return b":%d\r\n" % sum(1 for key in args if self._get(key) is not None)
+        if name == b"DBSIZE":
+            return b":%d\r\n" % len(self.data)
+        if name in (b"FLUSHALL", b"FLUSHDB"):
+            self.data.clear()
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.lower()
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _parse_command(buffer: bytes) -> Tuple[Optional[List[bytes]], bytes]:
+    """Split one complete command off `buffer`; (None, buffer) if it is incomplete."""
+    end = buffer.find(b"\r\n")
+    if end < 0:
+        return None, buffer
+    if not buffer.startswith(b"*"):
+        # Inline command, e.g. from `redis-cli` or telnet.
+        return buffer[:end].split(), buffer[end + 2:]
+    parts = []
+    pos = end + 2
+    for _ in range(int(buffer[1:end])):
+        end = buffer.find(b"\r\n", pos)
+        if end < 0:
+            return None, buffer
+        length = int(buffer[pos + 1:end])
+        start, pos = end + 2, end + 2 + length + 2
+        if pos > len(buffer):
+            return None, buffer
+        parts.append(buffer[start:start + length])
+    return parts, buffer[pos:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a Redis-protocol store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every round trip")
+    args = parser.parse_args()
+
+    async def serve() -> None:
+        fake = FakeRedis(latency=args.latency_ms / 1000)
+        port = await fake.start(args.host, args.port)
+        print(f"fake redis listening on {args.host}:{port}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
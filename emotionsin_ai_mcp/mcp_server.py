@@ -1,21 +1,102 @@
 # mcp_server.py
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import asyncio
+import hmac
 import logging
-from typing import Dict, Any
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple
 from fastmcp import FastMCP
+from mcp.types import EmptyResult, SubscribeRequestParams, UnsubscribeRequestParams
+
+try:
+    # mcp >= 2: 2026-07-28 clients get change notifications on subscriptions/listen streams
+    from mcp.server.subscriptions import InMemorySubscriptionBus, ListenHandler, ResourceUpdated
+    from mcp.types import SubscriptionsListenRequestParams
+except ImportError:
+    ListenHandler = None
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+
+import metrics
+import calllog
+import tracing
+from calllog import configure_logging
+from config import (
+    API_KEY,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_PROFILES,
+    METRICS_ENABLED,
+    MCP_TRANSPORT,
+    MCP_HTTP_PATH,
+    MCP_STATELESS_HTTP,
+    MCP_JSON_RESPONSE,
+    MCP_WORKERS,
+    MCP_GRACEFUL_TIMEOUT,
+    PROFILE_STORE_PATH,
+    WARMUP_PROFILES,
+    WARMUP_TIMEOUT,
+)
+from metrics import track_tool
+from admission import Overloaded
+from subscriptions import ResourceSubscriptions
+from persona import (
+    ContractCompileError,
+    add_change_listener,
+    admission,
+    load_persona,
+    open_client,
+    close_client,
+    open_store,
+    close_store,
+    invalidate_profile,
+    preload_shared,
+    shared_cache,
+    contract_cache,
+    profile_cache,
+    profile_flights,
+    warm_up,
+)
 
-from config import BACKEND_BASE
-from persona import compile_persona_contract, fetch_agent_from_link
+# Seconds spent importing this module and its dependencies (see --measure-startup)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+# Configure logging (queue-backed, see calllog.py)
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Keep one pooled backend client alive for the whole server lifetime
+    await open_client()
+    await open_store()
+    # Runs before uvicorn binds the port, so the instance only reports ready
+    # once the hot profiles are cached.
+    await warm_up(WARMUP_PROFILES, WARMUP_TIMEOUT)
+    try:
+        yield
+    finally:
+        await close_client()
+        await close_store()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 
 # Create the FastMCP app as the main application
-mcp = FastMCP("emotionsin-mcp")
+mcp = FastMCP("emotionsin-mcp", lifespan=lifespan)
 
 
 @mcp.tool()
-async def get_agent_contract_from_link(profile: str, headers: Dict[str, Any] | None = None) -> Dict[str, Any]:
+@track_tool("get_agent_contract_from_link")
+async def get_agent_contract_from_link(
+    profile: str,
+    headers: Dict[str, Any] | None = None,
+    include_raw: bool = True,
+    fields: List[str] | None = None,
+    if_none_match: str | None = None,
+) -> Dict[str, Any]:
     """
     Fetch an agent persona from the backend using a profile ID from the MCP URL
     and convert it into a fully structured, ready-to-use persona activation contract.
@@ -39,54 +120,436 @@ async def get_agent_contract_from_link(profile: str, headers: Dict[str, Any] | N
         - id: agent identifier
         - name: agent name
         - contract: the final activation prompt string
+        - contract_hash: content hash of the contract; equal hashes mean identical contracts
         - raw_profile: the raw JSON for debugging or extended use
+
+    Pass `include_raw=False` to drop `raw_profile` (roughly halves the
+    payload), or `fields=[...]` to return only the listed keys, e.g.
+    `["contract"]`.
+
+    Pass the `contract_hash` you already hold as `if_none_match` to skip
+    re-downloading an unchanged contract: the result is then just
+    {"not_modified": true, "contract_hash": <hash>}. When the contract has
+    changed, the full result is returned and always includes the new
+    `contract_hash`.
     """
-    logging.info(f"Tool 'get_agent_contract_from_link' called with profile: '{profile}'")
-    
+    selected = _select_fields(fields, include_raw)
+    if if_none_match is not None and "contract_hash" not in selected:
+        selected += ("contract_hash",)
+    return await _build_agent_contract(profile, selected, if_none_match)
+
+
+@mcp.tool()
+@track_tool("get_agent_contracts")
+async def get_agent_contracts(
+    profiles: List[str],
+    include_raw: bool = True,
+    fields: List[str] | None = None,
+) -> Dict[str, Any]:
+    """
+    Fetch and compile persona activation contracts for many profile IDs in
+    one call, e.g. to set up a multi-agent room.
+
+    Profiles are loaded concurrently (bounded by BATCH_CONCURRENCY) through
+    the same cache and connection pool as `get_agent_contract_from_link`;
+    with a shared cache tier, they are first looked up there together.
+    Duplicate IDs are only loaded once. One failing profile does not fail
+    the batch.
+
+    Returns a dict containing:
+        - results: one entry per requested profile, in request order. Each
+          entry is either the same dict `get_agent_contract_from_link`
+          returns, or {"profile": <id>, "error": <message>}
+        - succeeded / failed: counts
+
+    `include_raw` and `fields` trim each result as in
+    `get_agent_contract_from_link`.
+    """
+    if not profiles:
+        raise ValueError("Profiles parameter is required but was empty or missing")
+    if len(profiles) > BATCH_MAX_PROFILES:
+        raise ValueError(f"Too many profiles requested ({len(profiles)}); the limit is {BATCH_MAX_PROFILES}")
+    selected = _select_fields(fields, include_raw)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def load_one(profile: str) -> Dict[str, Any]:
+        # Per-profile timings would overwrite each other in the batch's record.
+        calllog.detach()
+        async with semaphore:
+            try:
+                return await _build_agent_contract(profile, selected)
+            except Exception as e:
+                return {"profile": profile, "error": str(e)}
+
+    unique = list(dict.fromkeys(profiles))
+    # One pipelined shared-cache lookup instead of one round trip per profile.
+    await preload_shared(unique)
+    loaded = dict(zip(unique, await asyncio.gather(*(load_one(p) for p in unique))))
+    results = [loaded[p] for p in profiles]
+    failed = sum(1 for r in results if "error" in r)
+    calllog.note("failed", failed)
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
+
+
+# Everything a contract result can contain, and how to build each key.
+_RESULT_FIELDS = {
+    "id": lambda loaded: loaded.agent.get("id"),
+    "name": lambda loaded: loaded.agent.get("name"),
+    "contract": lambda loaded: loaded.contract,
+    "contract_hash": lambda loaded: loaded.contract_hash,
+    "raw_profile": lambda loaded: loaded.agent,
+}
+ALL_FIELDS = tuple(_RESULT_FIELDS)
+
+
+def _select_fields(fields: List[str] | None, include_raw: bool) -> Tuple[str, ...]:
+    if fields:
+        unknown = [f for f in fields if f not in _RESULT_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}; choose from {list(ALL_FIELDS)}")
+        selected = tuple(dict.fromkeys(fields))
+    else:
+        selected = ALL_FIELDS
+    if not include_raw:
+        selected = tuple(f for f in selected if f != "raw_profile")
+    return selected
+
+
+async def _build_agent_contract(
+    profile: str,
+    fields: Tuple[str, ...] = ALL_FIELDS,
+    if_none_match: str | None = None,
+) -> Dict[str, Any]:
     if not profile or profile.strip() == "":
         logging.error("Profile parameter is empty or missing")
         raise ValueError("Profile parameter is required but was empty or missing")
     
-    url = f"{BACKEND_BASE}?id={profile}"
-    logging.info(f"Fetching agent from backend URL: {url}")
+    logging.debug("Loading agent profile '%s'", profile)
     
     try:
-        agent = await fetch_agent_from_link(url)
+        loaded = await load_persona(profile)
+    except Overloaded as e:
+        calllog.note("shed", e.reason)
+        raise
+    except ContractCompileError as e:
+        logging.error("Failed to compile persona contract: %s", e)
+        raise RuntimeError(f"Failed to compile persona contract: {e}")
     except Exception as e:
-        logging.error(f"Failed to fetch agent from backend: {type(e).__name__}: {e}")
+        logging.error("Failed to fetch agent from backend: %s: %s", type(e).__name__, e)
         raise RuntimeError(f"Failed to fetch agent profile '{profile}' from backend: {e}")
     
+    agent = loaded.agent
     if not agent:
-        logging.warning(f"Agent profile '{profile}' not found at backend (empty response).")
+        logging.warning("Agent profile '%s' not found at backend (empty response).", profile)
         raise ValueError(f"Agent profile '{profile}' not found at backend.")
 
-    logging.info(f"Agent profile found for '{profile}': {agent.get('name', 'unnamed')}")
-    
+    logging.debug("Agent profile found for '%s': %s", profile, agent.get("name", "unnamed"))
+    if if_none_match is not None and if_none_match == loaded.contract_hash:
+        # The caller already holds this exact contract.
+        calllog.note("not_modified", True)
+        metrics.CONTRACT_NOT_MODIFIED.inc()
+        return {"not_modified": True, "contract_hash": loaded.contract_hash}
+    # Only build (and later serialize) the keys the caller asked for.
+    return {field: _RESULT_FIELDS[field](loaded) for field in fields}
+
+
+PROFILE_RESOURCE = "emotionsin://profile/{profile}"
+# Fields a profile resource carries; raw_profile stays a tool-only option.
+_RESOURCE_FIELDS = ("id", "name", "contract", "contract_hash")
+_listen_bus = InMemorySubscriptionBus() if ListenHandler is not None else None
+subscriptions = ResourceSubscriptions(
+    publish=(lambda uri: _listen_bus.publish(ResourceUpdated(uri=uri))) if _listen_bus is not None else None
+)
+
+
+def profile_uri(profile_id: str) -> str:
+    return PROFILE_RESOURCE.format(profile=profile_id)
+
+
+@mcp.resource(PROFILE_RESOURCE, mime_type="application/json")
+@track_tool("profile_resource")
+async def profile_resource(profile: str) -> Dict[str, Any]:
+    """
+    The persona activation contract for a profile ID, as a resource.
+
+    Clients can read it once, keep it across sessions and subscribe to the
+    URI: the server sends `notifications/resources/updated` when the profile
+    is invalidated or a refresh finds a different contract. Contains id,
+    name, contract and contract_hash (see `get_agent_contract_from_link`).
+    """
+    return await _build_agent_contract(profile, _RESOURCE_FIELDS)
+
+
+def _peer(session: Any) -> Any:
+    """
+    The object to notify for `session`. mcp >= 2 builds a ServerSession per
+    request; the connection behind it is what lives as long as the client,
+    and can notify it. Its notifications never fail once the client is gone,
+    so its subscriptions are dropped when the connection is torn down.
+    """
+    connection = getattr(session, "_connection", None)
+    if connection is None:
+        return session
+    if not connection.state.get("emotionsin_subscriptions"):
+        connection.state["emotionsin_subscriptions"] = True
+        connection.exit_stack.callback(subscriptions.drop, connection)
+    return connection
+
+
+def _register_subscription_handlers(server) -> None:
+    """
+    Serve resources/subscribe and resources/unsubscribe (which also
+    advertises the capability), plus subscriptions/listen where the SDK has it.
+    """
+    if _listen_bus is not None:
+        server.add_request_handler(
+            "subscriptions/listen", SubscriptionsListenRequestParams, ListenHandler(_listen_bus)
+        )
+    if hasattr(server, "add_request_handler"):
+        # mcp >= 2: handlers take (request context, params)
+        async def subscribe(ctx, params: SubscribeRequestParams) -> EmptyResult:
+            subscriptions.subscribe(str(params.uri), _peer(ctx.session))
+            return EmptyResult()
+
+        async def unsubscribe(ctx, params: UnsubscribeRequestParams) -> EmptyResult:
+            subscriptions.unsubscribe(str(params.uri), _peer(ctx.session))
+            return EmptyResult()
+
+        server.add_request_handler("resources/subscribe", SubscribeRequestParams, subscribe)
+        server.add_request_handler("resources/unsubscribe", UnsubscribeRequestParams, unsubscribe)
+    else:
+        @server.subscribe_resource()
+        async def subscribe(uri) -> None:
+            subscriptions.subscribe(str(uri), server.request_context.session)
+
+        @server.unsubscribe_resource()
+        async def unsubscribe(uri) -> None:
+            subscriptions.unsubscribe(str(uri), server.request_context.session)
+
+
+_register_subscription_handlers(mcp._mcp_server)
+# Invalidations (pushed, or from another worker) and refreshes that found a
+# new contract reach subscribed clients of this process.
+add_change_listener(lambda profile_id: subscriptions.notify_soon(profile_uri(profile_id)))
+
+
+@mcp.custom_route("/cache/stats", methods=["GET"])
+async def cache_stats(request: Request) -> JSONResponse:
+    """Hit / miss / eviction counters of the in-process profile cache."""
+    return JSONResponse({
+        "profiles": profile_cache.stats(),
+        "contracts": contract_cache.stats(),
+        "singleflight": profile_flights.stats(),
+        "subscriptions": subscriptions.stats(),
+        "admission": admission.stats(),
+        "shared": shared_cache.stats() if shared_cache is not None else None,
+        "tracing": tracing.stats(),
+    })
+
+
+def _authorized(request: Request) -> bool:
+    """Check `X-API-Key` or `Authorization: Bearer` against MCP_API_KEY; always False without a key."""
+    if not API_KEY:
+        return False
+    supplied = request.headers.get("x-api-key", "")
+    auth = request.headers.get("authorization", "")
+    if not supplied and auth.lower().startswith("bearer "):
+        supplied = auth[7:].strip()
+    return hmac.compare_digest(supplied.encode(), API_KEY.encode())
+
+
+if not API_KEY:
+    logging.warning("MCP_API_KEY is not set; /profiles/{id}/invalidate will reject every call")
+
+
+@mcp.custom_route("/profiles/{profile_id}/invalidate", methods=["POST"])
+async def invalidate(request: Request) -> JSONResponse:
+    """
+    Called by the profile backend when a profile changes: drop it from every
+    cache layer. `?prefetch=true` reloads it in the background right away.
+    """
+    if not _authorized(request):
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    prefetch = request.query_params.get("prefetch", "false").lower() == "true"
+    return JSONResponse(await invalidate_profile(request.path_params["profile_id"], prefetch=prefetch))
+
+
+if METRICS_ENABLED:
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def prometheus_metrics(request: Request) -> PlainTextResponse:
+        """Prometheus text exposition of tool, backend and cache metrics."""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def create_app():
+    """
+    Build the ASGI app for the configured MCP_TRANSPORT:
+      - "sse":  legacy SSE transport at /sse (one long-lived, instance-pinned stream per client)
+      - "http": streamable HTTP at MCP_HTTP_PATH (stateless by default, so any
+                instance can answer any tools/call without session affinity)
+      - "both": streamable HTTP plus the SSE routes on the same port
+    """
+    if MCP_TRANSPORT == "sse":
+        return mcp.http_app(transport="sse", path="/sse")
+
+    app = mcp.http_app(
+        path=MCP_HTTP_PATH,
+        stateless_http=MCP_STATELESS_HTTP,
+        json_response=MCP_JSON_RESPONSE,
+        # Sampled requests get a root span covering the whole transport round trip.
+        middleware=[Middleware(tracing.TraceMiddleware, paths=(MCP_HTTP_PATH.rstrip("/"),))],
+    )
+    if MCP_TRANSPORT == "both":
+        # The streamable-HTTP lifespan already runs the server lifespan the
+        # SSE routes depend on, so only the SSE transport routes are borrowed.
+        sse_app = mcp.http_app(transport="sse", path="/sse")
+        app.router.routes.extend(
+            route for route in sse_app.routes if getattr(route, "path", None) in ("/sse", "/messages")
+        )
+    if WARMUP_PROFILES:
+        _warm_transport(app)
+    return app
+
+
+async def measure_startup(profile: str) -> Dict[str, Any]:
+    """
+    Start the server on a free local port, send one tools/call as soon as it
+    accepts connections, then shut down. Reports where cold-start time goes.
+    """
+    import httpx
+    import uvicorn
+
+    started = time.perf_counter()
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=0, log_config=None))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+            raise RuntimeError("server exited during startup")
+        await asyncio.sleep(0.001)
+    ready = time.perf_counter()
+
+    port = server.servers[0].sockets[0].getsockname()[1]
     try:
-        contract = compile_persona_contract(agent)
-    except Exception as e:
-        logging.error(f"Failed to compile persona contract: {type(e).__name__}: {e}")
-        raise RuntimeError(f"Failed to compile persona contract: {e}")
-    
-    logging.info(f"Contract compiled successfully for agent: {agent.get('name')}")
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            await _request_over_http(client, MCP_HTTP_PATH, "tools/call", _tool_call_params(profile))
+            served = time.perf_counter()
+            # A second request shows the steady state for comparison.
+            await _request_over_http(client, MCP_HTTP_PATH, "tools/call", _tool_call_params(profile))
+            repeated = time.perf_counter()
+    finally:
+        server.should_exit = True
+        await serving
+
     return {
-        "id": agent.get("id"),
-        "name": agent.get("name"),
-        "contract": contract,
-        "raw_profile": agent
+        "profile": profile,
+        "warmup_profiles": len(WARMUP_PROFILES),
+        "import_s": round(IMPORT_SECONDS, 4),
+        "startup_s": round(ready - started, 4),
+        "first_request_s": round(served - ready, 4),
+        "time_to_first_request_s": round(IMPORT_SECONDS + served - started, 4),
+        "second_request_s": round(repeated - served, 4),
     }
 
 
+async def _request_over_http(client, path: str, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+    """Send initialize + one `method` request over streamable HTTP."""
+    headers = {"Accept": "application/json, text/event-stream"}
+    r = await client.post(path, headers=headers, json={
+        "jsonrpc": "2.0", "id": 0, "method": "initialize",
+        "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+                   "clientInfo": {"name": "emotionsin-warmup", "version": "1"}},
+    })
+    r.raise_for_status()
+    if "mcp-session-id" in r.headers:
+        headers["mcp-session-id"] = r.headers["mcp-session-id"]
+    r = await client.post(path, headers=headers, json={
+        "jsonrpc": "2.0", "id": 1, "method": method, "params": params or {},
+    })
+    r.raise_for_status()
+    if "mcp-session-id" in headers:
+        await client.delete(path, headers=headers)
+
+
+def _tool_call_params(profile: str) -> Dict[str, Any]:
+    return {"name": "get_agent_contract_from_link", "arguments": {"profile": profile}}
+
+
+def _warm_transport(app) -> None:
+    """
+    The first request through the MCP transport imports and builds a lot
+    lazily (session state, request handling). Send one tools/list through
+    the app in-process once its lifespan has started, so that cost is paid
+    before uvicorn starts accepting connections. A tools/list calls no
+    tool, so it adds nothing to the tool metrics or the call log, and it
+    fetches nothing from the backend.
+    """
+    import httpx
+
+    inner = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def warm_lifespan(a):
+        async with inner(a) as state:
+            start = time.perf_counter()
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://warmup") as client:
+                    await _request_over_http(client, MCP_HTTP_PATH, "tools/list")
+                logging.info("MCP transport warmed up in %.3fs", time.perf_counter() - start)
+            except Exception as e:
+                logging.warning("MCP transport warm-up failed: %s: %s", type(e).__name__, e)
+            yield state
+
+    app.router.lifespan_context = warm_lifespan
+
+
 if __name__ == "__main__":
+    import argparse
+    import json
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Emotionsin.ai MCP server")
+    parser.add_argument(
+        "--measure-startup",
+        metavar="PROFILE",
+        nargs="?",
+        const="",
+        help="report import time and time to the first served request (for PROFILE, "
+             "default the first WARMUP_PROFILES entry), then exit",
+    )
+    args = parser.parse_args()
+    if args.measure_startup is not None:
+        if MCP_TRANSPORT == "sse":
+            parser.error("--measure-startup needs streamable HTTP (MCP_TRANSPORT=http or both)")
+        profile = args.measure_startup or (WARMUP_PROFILES[0] if WARMUP_PROFILES else "demo")
+        print(json.dumps(asyncio.run(measure_startup(profile)), indent=2))
+        raise SystemExit(0)
+
     # Cloud Run: listen on 0.0.0.0 and PORT from env
     port = int(os.environ.get("PORT", "8080"))
 
-    # Run the MCP server using SSE transport (compatible with Claude)
-    # Streamable-http clients (like ChatGPT) also work with SSE
-    # The endpoint will be available at: http://<service-url>/sse
-    mcp.run(
-        transport="sse",
-        host="0.0.0.0",
-        port=port,
-        path="/sse"
-    )
+    # SSE keeps Claude-style clients working; streamable HTTP (ChatGPT and
+    # the demos) is served at /mcp. See MCP_TRANSPORT in config.py.
+    if MCP_WORKERS > 1:
+        # Each worker builds its own app; send SIGHUP to restart workers one
+        # by one (graceful reload), SIGTERM to drain and stop.
+        logging.info("Starting %d workers sharing profile store %s", MCP_WORKERS, PROFILE_STORE_PATH)
+        uvicorn.run(
+            "mcp_server:create_app",
+            factory=True,
+            host="0.0.0.0",
+            port=port,
+            workers=MCP_WORKERS,
+            timeout_graceful_shutdown=MCP_GRACEFUL_TIMEOUT,
+            log_config=None,  # uvicorn logs go through our queue-backed root handler
+        )
+    else:
+        uvicorn.run(
+            create_app(),
+            host="0.0.0.0",
+            port=port,
+            timeout_graceful_shutdown=MCP_GRACEFUL_TIMEOUT,
+            log_config=None,
+        )
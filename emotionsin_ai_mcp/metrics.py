@@ -0,0 +1,281 @@
+# metrics.py
+"""
+Minimal, dependency-free Prometheus metrics for the tool hot path.
+
+Labelled children are created once and reused, and histograms use fixed
+bucket arrays, so recording a sample is a couple of integer/float updates
+with no per-call allocation. `render()` produces the Prometheus text
+exposition format served at `/metrics`.
+"""
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import calllog
+import tracing
+
+# Seconds; tuned for a backend round trip of a few ms to a few s.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {c.value}" for k, c in self._children.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # Called at scrape time to refresh gauges derived from other state.
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+TOOL_CALLS = REGISTRY.register(Counter(
+    "emotionsin_tool_calls_total", "MCP tool calls", ["tool"]))
+TOOL_ERRORS = REGISTRY.register(Counter(
+    "emotionsin_tool_errors_total", "MCP tool calls that raised", ["tool"]))
+TOOL_IN_FLIGHT = REGISTRY.register(Gauge(
+    "emotionsin_tool_in_flight", "MCP tool calls currently running", ["tool"]))
+TOOL_LATENCY = REGISTRY.register(Histogram(
+    "emotionsin_tool_latency_seconds", "End-to-end MCP tool latency", ["tool"]))
+PHASE_LATENCY = REGISTRY.register(Histogram(
+    "emotionsin_phase_latency_seconds", "Time spent per phase of loading a persona", ["phase"]))
+BACKEND_RESPONSES = REGISTRY.register(Counter(
+    "emotionsin_backend_responses_total", "Profile backend responses by HTTP status (or 'error')", ["status"]))
+BACKEND_RETRIES = REGISTRY.register(Counter(
+    "emotionsin_backend_retries_total", "Profile backend GETs retried after a transient failure"))
+BACKEND_HEDGES = REGISTRY.register(Counter(
+    "emotionsin_backend_hedges_total", "Hedged (duplicate) profile backend GETs sent"))
+BACKEND_SHORT_CIRCUITS = REGISTRY.register(Counter(
+    "emotionsin_backend_short_circuits_total", "Profile loads rejected because the circuit was open"))
+BACKEND_CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    "emotionsin_backend_circuit_open", "1 while the backend circuit breaker is open"))
+STALE_ON_ERROR = REGISTRY.register(Counter(
+    "emotionsin_stale_on_error_total", "Expired profiles served because the backend failed"))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "emotionsin_cache_lookups_total", "Cache lookups (and evictions) by result", ["cache", "result"]))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "emotionsin_cache_hit_ratio", "Share of cache lookups served from cache", ["cache"]))
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    "emotionsin_cache_entries", "Entries currently cached", ["cache"]))
+ADMISSION_SHED = REGISTRY.register(Counter(
+    "emotionsin_admission_shed_total", "Backend-bound calls rejected as overloaded", ["reason"]))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "emotionsin_admission_in_flight", "Backend-bound calls currently admitted"))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "emotionsin_admission_queue_depth", "Backend-bound calls waiting for admission"))
+CONTRACT_NOT_MODIFIED = REGISTRY.register(Counter(
+    "emotionsin_contract_not_modified_total", "Contract requests answered not_modified via if_none_match"))
+INVALIDATIONS = REGISTRY.register(Counter(
+    "emotionsin_invalidations_total", "Profile invalidations applied, by origin", ["origin"]))
+WARMUP_SECONDS = REGISTRY.register(Gauge(
+    "emotionsin_warmup_seconds", "Time spent warming up hot profiles at startup"))
+WARMUP_LOADED = REGISTRY.register(Gauge(
+    "emotionsin_warmup_profiles_loaded", "Hot profiles loaded during startup warm-up"))
+
+BACKEND_FETCH = PHASE_LATENCY.labels("backend_fetch")
+JSON_DECODE = PHASE_LATENCY.labels("json_decode")
+CONTRACT_COMPILE = PHASE_LATENCY.labels("contract_compile")
+
+
+def register_cache(name: str, cache) -> None:
+    """
+    Export a cache's `stats()`, refreshed on every scrape. The cache keeps
+    its own cumulative counts, so lookups are copied into a counter as-is.
+    """
+    lookups = {result: CACHE_LOOKUPS.labels(name, result) for result in ("hit", "stale_hit", "miss", "eviction")}
+    ratio = CACHE_HIT_RATIO.labels(name)
+    entries = CACHE_ENTRIES.labels(name)
+
+    def collect() -> None:
+        stats = cache.stats()
+        lookups["hit"].set(stats["hits"])
+        lookups["stale_hit"].set(stats["stale_hits"])
+        lookups["miss"].set(stats["misses"])
+        lookups["eviction"].set(stats["evictions"])
+        ratio.set(stats["hit_ratio"])
+        entries.set(stats["entries"])
+
+    REGISTRY.add_collector(collect)
+
+
+def track_tool(name: str):
+    """
+    Decorator recording call count, errors, in-flight and latency for a
+    tool, emitting its one structured call-log record and its trace span.
+    """
+    calls = TOOL_CALLS.labels(name)
+    errors = TOOL_ERRORS.labels(name)
+    in_flight = TOOL_IN_FLIGHT.labels(name)
+    latency = TOOL_LATENCY.labels(name)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            calls.inc()
+            in_flight.inc()
+            fields = _call_fields(kwargs)
+            token = calllog.start_call(name, **fields)
+            error = None
+            start = time.perf_counter()
+            try:
+                with tracing.trace(f"tool {name}", tool=name, **fields):
+                    return await fn(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                errors.inc()
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                latency.observe(elapsed)
+                in_flight.dec()
+                calllog.finish_call(token, elapsed, error)
+        return wrapper
+
+    return decorator
+
+
+def _call_fields(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {}
+    if "profile" in kwargs:
+        fields["profile"] = kwargs["profile"]
+    if "profiles" in kwargs:
+        fields["profiles"] = len(kwargs["profiles"] or ())
+    return fields
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,27 +1,652 @@
 # persona.py
-from typing import Any, Dict
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
 import httpx
-from config import DEFAULT_TIMEOUT
+import calllog
+import metrics
+import tracing
+from admission import AdmissionController
+from cache import ProfileCache, FRESH, STALE
+from singleflight import SingleFlight
+from resilience import RETRYABLE_STATUS, ResilientBackend
+from store import ProfileStore
+from shared_cache import SharedCache
+from config import (
+    BACKEND_BASE,
+    DEFAULT_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    PROFILE_CACHE_TTL,
+    PROFILE_CACHE_STALE_TTL,
+    PROFILE_CACHE_MAX_ENTRIES,
+    PROFILE_CACHE_MAX_BYTES,
+    CONTRACT_CACHE_MAX_ENTRIES,
+    PROFILE_STORE_PATH,
+    INVALIDATION_POLL_INTERVAL,
+    SHARED_CACHE_URL,
+    SHARED_CACHE_TTL,
+    SHARED_CACHE_LOCAL_TTL,
+    SHARED_CACHE_TIMEOUT,
+    BACKEND_RETRIES,
+    BACKEND_RETRY_BACKOFF,
+    BACKEND_RETRY_BACKOFF_MAX,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    SERVE_STALE_ON_ERROR,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_PER_PROFILE,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+)
+
+# One pooled client per process, opened/closed by the FastMCP app lifespan.
+_client: Optional[httpx.AsyncClient] = None
+
+profile_cache = ProfileCache(
+    # With a shared tier behind it, the local copy only needs to live briefly.
+    ttl=min(PROFILE_CACHE_TTL, SHARED_CACHE_LOCAL_TTL) if SHARED_CACHE_URL else PROFILE_CACHE_TTL,
+    stale_ttl=PROFILE_CACHE_STALE_TTL,
+    max_entries=PROFILE_CACHE_MAX_ENTRIES,
+    max_bytes=PROFILE_CACHE_MAX_BYTES,
+)
+# Rendered contracts keyed by content hash; they never go stale, only get evicted.
+contract_cache = ProfileCache(ttl=float("inf"), max_entries=CONTRACT_CACHE_MAX_ENTRIES)
+# Background stale-while-revalidate refreshes, at most one per profile ID.
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+profile_flights = SingleFlight()
+metrics.register_cache("profiles", profile_cache)
+metrics.register_cache("contracts", contract_cache)
+backend = ResilientBackend(
+    retries=BACKEND_RETRIES,
+    backoff=BACKEND_RETRY_BACKOFF,
+    backoff_max=BACKEND_RETRY_BACKOFF_MAX,
+    hedge=HEDGE_ENABLED,
+    hedge_percentile=HEDGE_PERCENTILE,
+    hedge_min_delay=HEDGE_MIN_DELAY,
+    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=CIRCUIT_RESET_TIMEOUT,
+)
+metrics.REGISTRY.add_collector(lambda: metrics.BACKEND_CIRCUIT_OPEN.set(1 if backend.breaker.is_open else 0))
+# Caps backend fetches; cache hits and callers joining an in-flight fetch never queue here.
+admission = AdmissionController(
+    max_concurrent=ADMISSION_MAX_CONCURRENT,
+    max_per_key=ADMISSION_MAX_PER_PROFILE,
+    max_queue=ADMISSION_QUEUE_SIZE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+)
+
+
+def _collect_admission() -> None:
+    metrics.ADMISSION_IN_FLIGHT.set(admission.in_flight)
+    metrics.ADMISSION_QUEUE_DEPTH.set(admission.waiting)
+
+
+metrics.REGISTRY.add_collector(_collect_admission)
+
+# Optional on-disk copy of profiles so new instances start warm.
+profile_store: Optional[ProfileStore] = ProfileStore(PROFILE_STORE_PATH) if PROFILE_STORE_PATH else None
+# Optional second-level cache shared by all instances.
+shared_cache: Optional[SharedCache] = (
+    SharedCache(SHARED_CACHE_URL, ttl=SHARED_CACHE_TTL, timeout=SHARED_CACHE_TIMEOUT) if SHARED_CACHE_URL else None
+)
+# Bumped on every invalidation, so a fetch that started before it cannot put
+# the old profile back into the caches. Only IDs with a fetch in flight
+# (counted in `_fetches`) need one, so both entries go when the last ends.
+_generations: Dict[str, int] = {}
+_fetches: Dict[str, int] = {}
+# Store invalidation log: last sequence seen, and the ones this process wrote.
+_invalidation_seq = 0
+_own_invalidations: Set[int] = set()
+_invalidation_watcher: Optional[asyncio.Task] = None
+# Called with a profile ID whenever its contract may have changed.
+_change_listeners: List[Callable[[str], None]] = []
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+async def open_client() -> httpx.AsyncClient:
+    """
+    Create the shared backend client so every fetch reuses warm
+    keep-alive connections instead of paying DNS + TCP + TLS each time.
+    """
+    global _client
+    if _client is not None and not _client.is_closed:
+        return _client
+
+    http2 = HTTP2_ENABLED
+    if http2 and not _http2_available():
+        logging.warning("HTTP2_ENABLED is set but the 'h2' package is missing; falling back to HTTP/1.1")
+        http2 = False
+
+    _client = httpx.AsyncClient(
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+    )
+    logging.info(
+        "Backend connection pool opened (max_connections=%d, keepalive=%d, http2=%s)",
+        HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, http2,
+    )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared backend client and drop its pooled connections."""
+    global _client
+    for task in list(_refresh_tasks.values()):
+        task.cancel()
+    _refresh_tasks.clear()
+    profile_flights.cancel_all()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logging.info("Backend connection pool closed")
+
+
+async def open_store() -> None:
+    global _invalidation_seq, _invalidation_watcher
+    if shared_cache is not None:
+        await shared_cache.open()
+    if profile_store is not None:
+        await profile_store.open()
+        logging.info("Profile store opened at %s", profile_store.path)
+        # Only invalidations logged from now on concern this process's memory.
+        _invalidation_seq = await profile_store.last_invalidation()
+        _invalidation_watcher = asyncio.create_task(_watch_invalidations())
+
+
+async def close_store() -> None:
+    global _invalidation_watcher
+    if _invalidation_watcher is not None:
+        _invalidation_watcher.cancel()
+        _invalidation_watcher = None
+    if profile_store is not None:
+        await profile_store.close()
+    if shared_cache is not None:
+        await shared_cache.close()
+
+
+async def get_client() -> httpx.AsyncClient:
+    # Falls back to opening the pool lazily when used outside the app lifespan
+    # (e.g. scripts or a REPL).
+    if _client is None or _client.is_closed:
+        return await open_client()
+    return _client
+
+
+def profile_url(profile_id: str) -> str:
+    return f"{BACKEND_BASE}?id={profile_id}"
+
+
+@dataclass
+class CachedPersona:
+    """A fetched profile, its compiled contract and the backend's validators."""
+    agent: Dict[str, Any]
+    contract: Optional[str]
+    contract_hash: Optional[str] = None
+    size: int = 0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "agent": self.agent,
+            "contract": self.contract,
+            "contract_hash": self.contract_hash,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "size": self.size,
+            "fetched_at": time.time(),
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "CachedPersona":
+        return cls(
+            agent=record["agent"],
+            contract=record["contract"],
+            contract_hash=record["contract_hash"],
+            size=record["size"],
+            etag=record["etag"],
+            last_modified=record["last_modified"],
+        )
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
 
 async def fetch_agent_from_link(url: str) -> Dict[str, Any]:
-    async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        # The backend now returns a single, clean JSON object.
-        return r.json()
+    """
+    Return the agent profile at `url`. Profile URLs of the configured
+    backend are served through `load_persona` (and its caches); any other
+    URL is fetched with the shared client.
+    """
+    base, _, query = url.partition("?")
+    profile_id = parse_qs(query).get("id", [""])[0]
+    if base == BACKEND_BASE and profile_id:
+        return (await load_persona(profile_id)).agent
+    client = await get_client()
+    r = await client.get(url)
+    r.raise_for_status()
+    return r.json()
 
-def compile_persona_contract(agent: Dict[str, Any]) -> str:
+
+class ContractCompileError(RuntimeError):
+    """Raised when a fetched profile cannot be turned into a contract."""
+
+
+async def _remember(profile_id: str, persona: CachedPersona, generation: int) -> None:
+    if _generations.get(profile_id, 0) != generation:
+        # Invalidated while this fetch was in flight; don't cache what may be the old version.
+        return
+    profile_cache.set(profile_id, persona, persona.size)
+    record = persona.to_record()
+    if profile_store is not None:
+        with tracing.span("store.put"):
+            try:
+                await profile_store.put(profile_id, record)
+            except Exception as e:
+                logging.warning("Could not persist profile '%s': %s: %s", profile_id, type(e).__name__, e)
+    if shared_cache is not None:
+        with tracing.span("shared_cache.put"):
+            await shared_cache.put(profile_id, record)
+
+
+def _from_record(profile_id: str, record: Dict[str, Any], generation: int) -> Tuple[Optional[CachedPersona], float]:
+    """Turn a stored record back into a persona; returns (persona, age in seconds)."""
+    if _generations.get(profile_id, 0) != generation:
+        # Invalidated while the record was being read.
+        return None, 0.0
+    persona = CachedPersona.from_record(record)
+    if persona.contract_hash != contract_hash(*_contract_inputs(persona.agent)):
+        # Stored by a build with a different activation template.
+        persona.contract, persona.contract_hash = render_persona_contract(persona.agent)
+    return persona, max(0.0, time.time() - record["fetched_at"])
+
+
+async def _load_from_store(profile_id: str, generation: int) -> Tuple[Optional[CachedPersona], bool]:
+    """Return (stored persona, still fresh) from the on-disk store, if any."""
+    try:
+        record = await profile_store.get(profile_id)
+    except Exception as e:
+        logging.warning("Could not read profile '%s' from store: %s: %s", profile_id, type(e).__name__, e)
+        return None, False
+    if record is None:
+        return None, False
+    persona, age = _from_record(profile_id, record, generation)
+    if persona is None:
+        return None, False
+    profile_cache.set(profile_id, persona, persona.size, age=age)
+    return persona, age <= PROFILE_CACHE_TTL
+
+
+def _adopt_shared(profile_id: str, record: Dict[str, Any], generation: int) -> Tuple[Optional[CachedPersona], bool]:
+    """Cache a shared-tier record locally; returns (persona, still fresh)."""
+    persona, age = _from_record(profile_id, record, generation)
+    if persona is None:
+        return None, False
+    fresh = age <= PROFILE_CACHE_TTL
+    # A fresh shared copy starts a new (short) local lifetime; an old one is
+    # only kept for its validators.
+    profile_cache.set(profile_id, persona, persona.size, age=0.0 if fresh else age)
+    return persona, fresh
+
+
+async def preload_shared(profile_ids: List[str]) -> int:
     """
-    Wraps the pre-compiled agent prompt from the backend into a standard
-    MCP activation contract. This tells the LLM how to use the persona.
+    Fill the local cache for `profile_ids` from the shared tier in one
+    pipelined round trip, e.g. before a batch load. Returns how many were
+    found fresh there.
     """
-    # The backend now provides the full, ready-to-use system prompt.
-    # We just need to extract it.
-    core_contract = agent.get("prompt", "You are a helpful assistant.")
-    name = agent.get("name", "the agent")
+    if shared_cache is None:
+        return 0
+    wanted = [p for p in dict.fromkeys(profile_ids) if profile_cache.state(p) != FRESH]
+    found = await shared_cache.get_many(wanted)
+    loaded = 0
+    for profile_id, record in found.items():
+        _, fresh = _adopt_shared(profile_id, record, _generations.get(profile_id, 0))
+        loaded += fresh
+    return loaded
+
+
+def _stale_or_raise(profile_id: str, previous: Optional[CachedPersona], error: Exception) -> CachedPersona:
+    if previous is None or not SERVE_STALE_ON_ERROR:
+        raise error
+    # Backend unhealthy (or circuit open): an old contract beats no contract.
+    logging.warning(
+        "Serving expired profile '%s' after backend failure: %s: %s", profile_id, type(error).__name__, error
+    )
+    metrics.STALE_ON_ERROR.inc()
+    return previous
+
+
+async def _fetch_and_store(profile_id: str) -> CachedPersona:
+    _fetches[profile_id] = _fetches.get(profile_id, 0) + 1
+    try:
+        return await _fetch(profile_id, _generations.get(profile_id, 0))
+    finally:
+        _fetches[profile_id] -= 1
+        if not _fetches[profile_id]:
+            del _fetches[profile_id]
+            _generations.pop(profile_id, None)
+
+
+def _notify_if_changed(
+    profile_id: str, known: Optional[CachedPersona], persona: CachedPersona, generation: int
+) -> None:
+    """Tell change listeners when `persona` replaces a different contract this process was serving."""
+    if known is None or persona.contract_hash == known.contract_hash:
+        return
+    if _generations.get(profile_id, 0) != generation:
+        # Invalidated meanwhile; the invalidation already told them.
+        return
+    _changed(profile_id)
+
 
-    # === ACTIVATION WRAPPER (WHAT YOU USED TO TYPE MANUALLY) ===
-    activation_prompt = f"""
+async def _fetch(profile_id: str, generation: int) -> CachedPersona:
+    known = previous = profile_cache.peek(profile_id)
+    if profile_store is not None:
+        # Another worker process may already have refreshed this profile.
+        with tracing.span("store.get"):
+            stored, fresh = await _load_from_store(profile_id, generation)
+            tracing.note("fresh", fresh)
+        if fresh:
+            _notify_if_changed(profile_id, known, stored, generation)
+            return stored
+        previous = stored or previous
+    if shared_cache is not None:
+        # Another instance may already have fetched this profile.
+        with tracing.span("shared_cache.get"):
+            record = await shared_cache.get(profile_id)
+            tracing.note("hit", record is not None)
+        if record is not None:
+            shared, fresh = _adopt_shared(profile_id, record, generation)
+            if fresh:
+                calllog.note("shared_cache", "hit")
+                # Another instance may have fetched a newer contract first.
+                _notify_if_changed(profile_id, known, shared, generation)
+                return shared
+            previous = shared or previous
+
+    client = await get_client()
+    headers = previous.conditional_headers() if previous else None
+    start = time.perf_counter()
+    try:
+        with tracing.span("backend.fetch", conditional=headers is not None):
+            r = await backend.get(client, profile_url(profile_id), headers=headers)
+            tracing.note("http.status_code", r.status_code)
+    except Exception as e:
+        metrics.BACKEND_RESPONSES.labels("error").inc()
+        return _stale_or_raise(profile_id, previous, e)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.BACKEND_FETCH.observe(elapsed)
+        calllog.note("backend_fetch_ms", round(elapsed * 1000, 3))
+    metrics.BACKEND_RESPONSES.labels(str(r.status_code)).inc()
+    calllog.note("backend_status", r.status_code)
+    if r.status_code in RETRYABLE_STATUS:
+        # Still failing after the retries: same rule as the retry and breaker logic.
+        try:
+            r.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            return _stale_or_raise(profile_id, previous, e)
+
+    if r.status_code == 304 and previous is not None:
+        # Unchanged: reuse the stored profile and compiled contract as-is.
+        persona = replace(
+            previous,
+            etag=r.headers.get("etag", previous.etag),
+            last_modified=r.headers.get("last-modified", previous.last_modified),
+        )
+        await _remember(profile_id, persona, generation)
+        # `previous` may be a newer copy another worker or instance stored.
+        _notify_if_changed(profile_id, known, persona, generation)
+        return persona
+
+    r.raise_for_status()
+    start = time.perf_counter()
+    with tracing.span("json.decode", bytes=len(r.content)):
+        agent = r.json()
+    elapsed = time.perf_counter() - start
+    metrics.JSON_DECODE.observe(elapsed)
+    calllog.note("json_decode_ms", round(elapsed * 1000, 3))
+    if not agent:
+        return CachedPersona(agent=agent, contract=None)
+    start = time.perf_counter()
+    try:
+        with tracing.span("contract.compile"):
+            contract, digest = render_persona_contract(agent)
+    except Exception as e:
+        raise ContractCompileError(f"{type(e).__name__}: {e}") from e
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.CONTRACT_COMPILE.observe(elapsed)
+        calllog.note("compile_ms", round(elapsed * 1000, 3))
+
+    persona = CachedPersona(
+        agent=agent,
+        contract=contract,
+        contract_hash=digest,
+        size=len(r.content),
+        etag=r.headers.get("etag"),
+        last_modified=r.headers.get("last-modified"),
+    )
+    await _remember(profile_id, persona, generation)
+    _notify_if_changed(profile_id, known, persona, generation)
+    return persona
+
+
+async def _load_shared(profile_id: str, admit: bool = True) -> CachedPersona:
+    """
+    Fetch `profile_id`, sharing one fetch + compile among concurrent callers.
+    Only the caller that starts the fetch goes through admission (unless
+    `admit` is False); the others just wait for its result.
+    """
+    notes: Dict[str, Any] = {}
+
+    async def fetch() -> CachedPersona:
+        # The shared task can outlive the caller that started it, so it notes
+        # into its own dict, which that caller copies into its record once done.
+        calllog.redirect(notes)
+        if not admit:
+            return await _fetch_and_store(profile_id)
+        start = time.perf_counter()
+        async with admission.admit(profile_id) as queued:
+            if queued:
+                waited_ms = round((time.perf_counter() - start) * 1000, 3)
+                calllog.note("admission_wait_ms", waited_ms)
+                tracing.note("admission_wait_ms", waited_ms)
+                # Whoever held the slot we waited for may have cached it meanwhile.
+                cached, state = profile_cache.get(profile_id)
+                if state in (FRESH, STALE):
+                    return cached
+            return await _fetch_and_store(profile_id)
+
+    persona = await profile_flights.do(profile_id, fetch)
+    calllog.update(notes)
+    return persona
+
+
+def _schedule_refresh(profile_id: str) -> None:
+    if profile_id in _refresh_tasks:
+        return
+
+    async def refresh() -> None:
+        calllog.detach()  # the stale hit that scheduled this was already logged
+        try:
+            await _load_shared(profile_id, admit=False)
+        except Exception as e:
+            # Keep serving the stale copy; the next stale hit will retry.
+            logging.warning("Background refresh of profile '%s' failed: %s: %s", profile_id, type(e).__name__, e)
+        finally:
+            _refresh_tasks.pop(profile_id, None)
+
+    _refresh_tasks[profile_id] = asyncio.create_task(refresh())
+
+
+async def load_persona(profile_id: str) -> CachedPersona:
+    """
+    Return the profile and compiled contract for `profile_id`, served from the in-process
+    cache when possible. Stale entries are returned immediately while a
+    background task revalidates them; expired entries are revalidated with
+    a conditional GET before returning. `contract` is None when the
+    backend returned an empty profile. Raises `Overloaded` when the fetch
+    for a miss cannot be admitted in time.
+    """
+    with tracing.span("load_persona", profile=profile_id):
+        cached, state = profile_cache.get(profile_id)
+        calllog.note("cache", state or "miss")
+        tracing.note("cache", state or "miss")
+        if state == STALE:
+            _schedule_refresh(profile_id)
+        if state in (FRESH, STALE):
+            return cached
+        return await _load_shared(profile_id)
+
+
+def add_change_listener(listener: Callable[[str], None]) -> None:
+    """
+    Call `listener(profile_id)` when a profile is invalidated or a refresh
+    returns a different contract. Listeners run on the event loop and must
+    not block.
+    """
+    _change_listeners.append(listener)
+
+
+def _changed(profile_id: str) -> None:
+    for listener in _change_listeners:
+        try:
+            listener(profile_id)
+        except Exception as e:
+            logging.warning("Change listener failed for profile '%s': %s: %s", profile_id, type(e).__name__, e)
+
+
+def _evict_local(profile_id: str) -> bool:
+    """Drop `profile_id` from this process's memory; returns whether it was cached."""
+    if profile_id in _fetches:
+        _generations[profile_id] = _generations.get(profile_id, 0) + 1
+    refresh = _refresh_tasks.pop(profile_id, None)
+    if refresh is not None:
+        refresh.cancel()
+    # Callers already waiting on an in-flight fetch get its result, but new
+    # callers start a fresh one.
+    profile_flights.forget(profile_id)
+    previous = profile_cache.peek(profile_id)
+    if previous is not None and previous.contract_hash:
+        contract_cache.invalidate(previous.contract_hash)
+    cached = profile_cache.invalidate(profile_id)
+    _changed(profile_id)
+    return cached
+
+
+async def invalidate_profile(profile_id: str, prefetch: bool = False) -> Dict[str, Any]:
+    """
+    Forget `profile_id` in every cache layer (memory, contract memo, the
+    shared cache tier and the store, whose log tells other worker processes
+    to do the same). Other instances using the shared tier drop their
+    local copy within SHARED_CACHE_LOCAL_TTL.
+    With `prefetch`, load the new version in the background right away
+    instead of on the next request.
+    """
+    cached = _evict_local(profile_id)
+    shared = await shared_cache.delete(profile_id) if shared_cache is not None else False
+    stored = False
+    if profile_store is not None:
+        try:
+            stored, seq = await profile_store.invalidate(profile_id)
+            _own_invalidations.add(seq)
+        except Exception as e:
+            logging.warning("Could not invalidate profile '%s' in store: %s: %s", profile_id, type(e).__name__, e)
+    metrics.INVALIDATIONS.labels("local").inc()
+    if prefetch:
+        _schedule_refresh(profile_id)
+    logging.info(
+        "Invalidated profile '%s' (cached=%s, stored=%s, shared=%s, prefetch=%s)",
+        profile_id, cached, stored, shared, prefetch,
+    )
+    return {"profile": profile_id, "cached": cached, "stored": stored, "shared": shared, "prefetch": prefetch}
+
+
+async def _watch_invalidations() -> None:
+    """Apply invalidations logged in the shared store by other processes."""
+    global _invalidation_seq
+    while True:
+        await asyncio.sleep(INVALIDATION_POLL_INTERVAL)
+        try:
+            rows = await profile_store.invalidations_since(_invalidation_seq)
+        except Exception as e:
+            logging.warning("Could not read invalidation log: %s: %s", type(e).__name__, e)
+            continue
+        for seq, profile_id in rows:
+            _invalidation_seq = seq
+            if seq in _own_invalidations:
+                _own_invalidations.discard(seq)
+                continue
+            _evict_local(profile_id)
+            metrics.INVALIDATIONS.labels("peer").inc()
+
+
+async def warm_up(profile_ids: List[str], timeout: float) -> int:
+    """
+    Load `profile_ids` concurrently so their profiles and rendered contracts
+    are cached (and the backend pool has live connections) before the first
+    request. Failures are logged, not raised; gives up after `timeout`
+    seconds. Returns the number of profiles loaded.
+    """
+    await get_client()
+    if not profile_ids:
+        return 0
+
+    async def load(profile_id: str) -> bool:
+        try:
+            return (await load_persona(profile_id)).contract is not None
+        except Exception as e:
+            logging.warning("Warm-up of profile '%s' failed: %s: %s", profile_id, type(e).__name__, e)
+            return False
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(load(p)) for p in dict.fromkeys(profile_ids)]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    loaded = sum(1 for task in done if task.result())
+    elapsed = time.perf_counter() - start
+    metrics.WARMUP_SECONDS.set(elapsed)
+    metrics.WARMUP_LOADED.set(loaded)
+    if pending:
+        logging.warning("Warm-up timed out after %ss; %d profile(s) still loading", timeout, len(pending))
+    logging.info("Warmed up %d/%d profile(s) in %.3fs", loaded, len(tasks), elapsed)
+    return loaded
+
+
+# === ACTIVATION WRAPPER (WHAT YOU USED TO TYPE MANUALLY) ===
+# Split once at import into the static pieces around the two slots, so
+# rendering is a plain join instead of an f-string build + strip().
+_ACTIVATION_TEMPLATE = """
 You have just fetched this persona from the Emotionsin.ai MCP server:
 
 [AGENT PERSONA CONTRACT]
@@ -37,5 +662,48 @@ Rules:
 
 Acknowledge with one sentence confirming you will follow this persona.
 """.strip()
+_HEAD, _rest = _ACTIVATION_TEMPLATE.split("{core_contract}")
+_MIDDLE, _TAIL = _rest.split("{name}")
+# Bump when the wrapper text changes so old contract hashes stop matching.
+_TEMPLATE_VERSION = "1"
+
+
+def contract_hash(core_contract: str, name: str) -> str:
+    h = hashlib.sha256()
+    for part in (_TEMPLATE_VERSION, core_contract, name):
+        data = part.encode("utf-8", "surrogatepass")
+        # Length-prefixed, so no content (not even a NUL) can shift the split between parts.
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
 
-    return activation_prompt
+
+def _contract_inputs(agent: Dict[str, Any]) -> Tuple[str, str]:
+    # The backend now provides the full, ready-to-use system prompt.
+    # We just need to extract it.
+    core_contract = str(agent.get("prompt", "You are a helpful assistant."))
+    name = str(agent.get("name", "the agent"))
+    return core_contract, name
+
+
+def render_persona_contract(agent: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Return `(contract, contract_hash)` for an agent profile. Rendered
+    contracts are memoized by the content hash of `(prompt, name)`.
+    """
+    core_contract, name = _contract_inputs(agent)
+    key = contract_hash(core_contract, name)
+    contract, state = contract_cache.get(key)
+    if state != FRESH:
+        contract = "".join((_HEAD, core_contract, _MIDDLE, name, _TAIL))
+        contract_cache.set(key, contract, len(contract))
+    return contract, key
+
+
+def compile_persona_contract(agent: Dict[str, Any]) -> str:
+    """
+    Wraps the pre-compiled agent prompt from the backend into a standard
+    MCP activation contract. This tells the LLM how to use the persona.
+    """
+    contract, _ = render_persona_contract(agent)
+    return contract
@@ -0,0 +1,210 @@
+# resilience.py
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+
+import metrics
+import tracing
+
+# Statuses worth retrying for an idempotent GET.
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised without contacting the backend while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed backend calls and
+    fails fast for `reset_timeout` seconds. Then one probe call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0 or self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logging.info("Backend circuit closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.failure_threshold <= 0:
+            return
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logging.warning("Backend circuit opened after %d consecutive failures", self.failures)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Forget an abandoned half-open probe (e.g. the caller was cancelled)."""
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful backend latencies. The requested
+    percentile is recomputed every `refresh_every` samples rather than on
+    every lookup.
+    """
+
+    def __init__(self, pct: float, window: int = 256, refresh_every: int = 16):
+        self.pct = pct
+        self.refresh_every = refresh_every
+        self._samples: deque = deque(maxlen=window)
+        self._since_refresh = 0
+        self._value: Optional[float] = None
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh_every:
+            self._since_refresh = 0
+            ordered = sorted(self._samples)
+            self._value = ordered[max(0, math.ceil(self.pct / 100 * len(ordered)) - 1)]
+
+    def percentile(self) -> Optional[float]:
+        """None until enough samples have been seen."""
+        return self._value
+
+
+class ResilientBackend:
+    """
+    GETs against the profile backend with bounded, jittered retries, optional
+    hedging and a circuit breaker shared by all callers in the process.
+    Timeouts are not retried, so a hung backend costs one HTTP_TIMEOUT per call.
+    """
+
+    def __init__(
+        self,
+        retries: int = 2,
+        backoff: float = 0.05,
+        backoff_max: float = 1.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.05,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies = LatencyTracker(hedge_percentile)
+
+    def hedge_delay(self) -> float:
+        observed = self.latencies.percentile()
+        return max(self.hedge_min_delay, observed or 0.0)
+
+    async def get(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        if not self.breaker.allow():
+            metrics.BACKEND_SHORT_CIRCUITS.inc()
+            raise BackendUnavailable("Profile backend is unavailable (circuit open); try again shortly")
+
+        settled = False
+        attempt = 0
+        try:
+            while True:
+                try:
+                    with tracing.span("backend.request", attempt=attempt):
+                        # One span per attempt; its ID goes to the backend as `traceparent`.
+                        r = await self._attempt(client, url, tracing.inject(headers))
+                        tracing.note("http.status_code", r.status_code)
+                except httpx.TransportError as e:
+                    # A timeout already cost a full HTTP_TIMEOUT; retrying it would
+                    # multiply that for a hung backend. Hedging covers slow replies.
+                    if attempt >= self.retries or isinstance(e, httpx.TimeoutException):
+                        settled = True
+                        self.breaker.record_failure()
+                        raise
+                else:
+                    if r.status_code not in RETRYABLE_STATUS:
+                        settled = True
+                        self.breaker.record_success()
+                        return r
+                    if attempt >= self.retries:
+                        settled = True
+                        self.breaker.record_failure()
+                        return r
+                attempt += 1
+                metrics.BACKEND_RETRIES.inc()
+                # "Full jitter" exponential backoff
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+        finally:
+            if not settled:
+                self.breaker.release_probe()
+
+    async def _attempt(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+        start = time.perf_counter()
+        if not self.hedge:
+            r = await client.get(url, headers=headers)
+        else:
+            r = await self._hedged(client, url, headers)
+        if r.status_code < 500:
+            self.latencies.observe(time.perf_counter() - start)
+        return r
+
+    async def _hedged(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+        """
+        Send the request; if it has not answered within the tracked latency
+        percentile, send a second one and take whichever finishes first.
+        """
+        first = asyncio.ensure_future(client.get(url, headers=headers))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done:
+                return first.result()
+
+            metrics.BACKEND_HEDGES.inc()
+            tracing.note("hedged", True)
+            second = asyncio.ensure_future(client.get(url, headers=headers))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed: surface the original request's error.
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,115 @@
+# shared_cache.py
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+
+class SharedCache:
+    """
+    Second-level profile cache in a Redis-protocol store (Redis, Valkey,
+    KeyDB, Memorystore, ...), shared by every server instance so a profile
+    fetched by one of them is not fetched again by the others.
+
+    Entries hold the same record as the SQLite store: the profile, its
+    compiled contract and hash, the backend's validators and `fetched_at`.
+    They expire in the store after `ttl` seconds.
+
+    Needs the optional `redis` package. Every failure (missing package,
+    unreachable server, timeout) is logged and treated as a miss, so the
+    shared tier can only make things faster, never unavailable.
+    """
+
+    def __init__(self, url: str, ttl: float, timeout: float = 0.25, prefix: str = "emotionsin:profile:"):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout  # seconds per command; a slow shared tier must not slow down misses
+        self.prefix = prefix
+        self._redis = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def available(self) -> bool:
+        return self._redis is not None
+
+    async def open(self) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            logging.warning("SHARED_CACHE_URL is set but the 'redis' package is missing; shared cache disabled")
+            return
+        self._redis = redis.from_url(
+            self.url,
+            protocol=2,  # RESP2: understood by every Redis-protocol store, not only Redis 6+
+            socket_timeout=self.timeout,
+            socket_connect_timeout=self.timeout,
+        )
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _key(self, profile_id: str) -> str:
+        return self.prefix + profile_id
+
+    def _decode(self, raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.errors += 1
+        logging.warning("Shared cache %s failed: %s: %s", action, type(error).__name__, error)
+
+    async def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if self._redis is None:
+            return None
+        try:
+            return self._decode(await self._redis.get(self._key(profile_id)))
+        except Exception as e:
+            self._failed("get", e)
+            return None
+
+    async def get_many(self, profile_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up many profiles in one pipelined round trip; returns the ones found."""
+        if self._redis is None or not profile_ids:
+            return {}
+        try:
+            # A pipeline of GETs (not MGET), so keys may live on different cluster slots.
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for profile_id in profile_ids:
+                    pipe.get(self._key(profile_id))
+                values = await pipe.execute()
+        except Exception as e:
+            self._failed("get_many", e)
+            return {}
+        found = {}
+        for profile_id, raw in zip(profile_ids, values):
+            record = self._decode(raw)
+            if record is not None:
+                found[profile_id] = record
+        return found
+
+    async def put(self, profile_id: str, record: Dict[str, Any]) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(self._key(profile_id), json.dumps(record), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self._failed("put", e)
+
+    async def delete(self, profile_id: str) -> bool:
+        if self._redis is None:
+            return False
+        try:
+            return await self._redis.delete(self._key(profile_id)) > 0
+        except Exception as e:
+            self._failed("delete", e)
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"available": self.available, "hits": self.hits, "misses": self.misses, "errors": self.errors}
@@ -0,0 +1,48 @@
+# singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one shared task.
+
+    The first caller starts the work; everyone who arrives while it is in
+    flight awaits the same result (or exception). Waiters are shielded, so
+    a cancelled caller never cancels the shared work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def forget(self, key: str) -> None:
+        """Let the next `do(key)` start fresh work; current waiters keep theirs."""
+        self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
+
+    def cancel_all(self) -> None:
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._inflight.clear()
@@ -0,0 +1,159 @@
+# store.py
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id            TEXT PRIMARY KEY,
+    agent         TEXT NOT NULL,
+    contract      TEXT,
+    contract_hash TEXT,
+    etag          TEXT,
+    last_modified TEXT,
+    size          INTEGER NOT NULL DEFAULT 0,
+    fetched_at    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id  TEXT NOT NULL,
+    at  REAL NOT NULL
+);
+"""
+
+# Invalidation log rows older than this are pruned; peers poll far more often.
+_INVALIDATION_RETENTION = 3600.0
+
+_COLUMNS = ("agent", "contract", "contract_hash", "etag", "last_modified", "size", "fetched_at")
+
+
+class ProfileStore:
+    """
+    Optional on-disk SQLite store for fetched profiles, compiled contracts
+    and their HTTP validators, so a freshly started instance can serve (or
+    cheaply revalidate) profiles instead of re-downloading them.
+
+    Invalidations are logged in the same file so other processes sharing
+    it can drop their in-memory copies.
+
+    All SQLite work runs in a worker thread; the event loop never blocks
+    on disk I/O. The connection is opened on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            # WAL lets several processes read while one writes.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM profiles WHERE id = ?", (profile_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(_COLUMNS, row))
+        record["agent"] = json.loads(record["agent"])
+        return record
+
+    def _put(self, profile_id: str, record: Dict[str, Any]) -> None:
+        values = (
+            profile_id,
+            json.dumps(record["agent"]),
+            record.get("contract"),
+            record.get("contract_hash"),
+            record.get("etag"),
+            record.get("last_modified"),
+            record.get("size", 0),
+            record.get("fetched_at", time.time()),
+        )
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT OR REPLACE INTO profiles (id, {', '.join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            conn.commit()
+
+    def _delete(self, profile_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute("DELETE FROM profiles WHERE id = ?", (profile_id,)).rowcount
+            conn.commit()
+        return deleted > 0
+
+    def _invalidate(self, profile_id: str) -> Tuple[bool, int]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute("DELETE FROM profiles WHERE id = ?", (profile_id,)).rowcount
+            seq = conn.execute(
+                "INSERT INTO invalidations (id, at) VALUES (?, ?)", (profile_id, now)
+            ).lastrowid
+            conn.execute("DELETE FROM invalidations WHERE at < ?", (now - _INVALIDATION_RETENTION,))
+            conn.commit()
+        return deleted > 0, seq
+
+    def _invalidations_since(self, seq: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT seq, id FROM invalidations WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+
+    def _last_invalidation(self) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT MAX(seq) FROM invalidations").fetchone()
+        return row[0] or 0
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _open(self) -> None:
+        with self._lock:
+            self._connect()
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._open)
+
+    async def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, profile_id)
+
+    async def put(self, profile_id: str, record: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._put, profile_id, record)
+
+    async def delete(self, profile_id: str) -> bool:
+        return await asyncio.to_thread(self._delete, profile_id)
+
+    async def invalidate(self, profile_id: str) -> Tuple[bool, int]:
+        """
+        Delete a profile and log the invalidation for other processes
+        sharing this file. Returns (was stored, log sequence number).
+        """
+        return await asyncio.to_thread(self._invalidate, profile_id)
+
+    async def invalidations_since(self, seq: int) -> List[Tuple[int, str]]:
+        """(seq, profile ID) pairs logged after `seq`, oldest first."""
+        return await asyncio.to_thread(self._invalidations_since, seq)
+
+    async def last_invalidation(self) -> int:
+        return await asyncio.to_thread(self._last_invalidation)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close)
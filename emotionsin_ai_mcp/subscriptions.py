@@ -0,0 +1,84 @@
+# subscriptions.py
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+
+class ResourceSubscriptions:
+    """
+    Which MCP sessions subscribed to which resource URIs.
+
+    A client that disconnects without unsubscribing must be dropped with
+    `drop(session)` when its connection closes; one whose notification
+    fails is dropped by `notify`. Sessions are also held weakly, so one that
+    is garbage-collected goes too. `notify` sends
+    `notifications/resources/updated` to every subscriber of a URI, and
+    passes the URI to `publish` (e.g. an SDK event bus for clients that
+    listen through `subscriptions/listen` instead of subscribing here).
+    """
+
+    def __init__(self, publish: Optional[Callable[[str], Awaitable[None]]] = None):
+        self._publish = publish
+        self._sessions: Dict[str, "weakref.WeakSet[Any]"] = {}
+        self._pending: Set[asyncio.Task] = set()
+        self.sent = 0
+        self.failed = 0
+
+    def subscribe(self, uri: str, session: Any) -> None:
+        self._sessions.setdefault(uri, weakref.WeakSet()).add(session)
+
+    def unsubscribe(self, uri: str, session: Any) -> None:
+        sessions = self._sessions.get(uri)
+        if sessions is not None:
+            sessions.discard(session)
+            if not sessions:
+                del self._sessions[uri]
+
+    def drop(self, session: Any) -> None:
+        """Remove every subscription of `session` (e.g. when its connection closes)."""
+        for uri in [uri for uri, sessions in self._sessions.items() if session in sessions]:
+            self.unsubscribe(uri, session)
+
+    def subscribers(self, uri: str) -> int:
+        return len(self._sessions.get(uri, ()))
+
+    async def notify(self, uri: str) -> int:
+        """Tell every subscriber of `uri` to re-read it; returns how many sessions were told."""
+        if self._publish is not None:
+            try:
+                await self._publish(uri)
+            except Exception as e:
+                logging.warning("Could not publish update of %s: %s: %s", uri, type(e).__name__, e)
+        sessions = list(self._sessions.get(uri, ()))
+        if not sessions:
+            return 0
+        results = await asyncio.gather(
+            *(session.send_resource_updated(uri) for session in sessions), return_exceptions=True
+        )
+        for session, result in zip(sessions, results):
+            if isinstance(result, Exception):
+                # Closed stream: the client is gone, forget it.
+                logging.debug("Dropping subscriber of %s: %s: %s", uri, type(result).__name__, result)
+                self.unsubscribe(uri, session)
+                self.failed += 1
+        sent = sum(1 for result in results if not isinstance(result, Exception))
+        self.sent += sent
+        return sent
+
+    def notify_soon(self, uri: str) -> None:
+        """Schedule `notify(uri)` from synchronous code running on the event loop."""
+        if self._publish is None and not self.subscribers(uri):
+            return
+        task = asyncio.get_running_loop().create_task(self.notify(uri))
+        # Keep a reference until it finishes; the loop only holds weak ones.
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "resources": len(self._sessions),
+            "subscriptions": sum(len(s) for s in self._sessions.values()),
+            "sent": self.sent,
+            "failed": self.failed,
+        }
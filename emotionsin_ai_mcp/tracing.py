@@ -0,0 +1,397 @@
+# tracing.py
+"""
+Lightweight span tracing for the tool hot path.
+
+- A trace starts at an incoming streamable-HTTP request (`TraceMiddleware`,
+  which also continues a caller's W3C `traceparent`) or, where the
+  transport's context does not reach the tool (SSE), at the tool call
+  itself (`trace()` in `metrics.track_tool`).
+- `span(name)` times a block as a child of the current span; `note()` adds
+  an attribute to it. Outside a sampled trace both are a context-variable
+  lookup and nothing else, so unsampled calls cost next to nothing.
+- `inject(headers)` adds the current span as `traceparent` to outgoing
+  backend requests, so the backend's spans join the same trace.
+- Finished traces go to one exporter: "memory" (tests), "file" (JSON
+  lines) or "otlp" (OTLP/HTTP JSON). File and OTLP exporters write from a
+  background thread, never on the event loop.
+
+TRACE_SAMPLE_RATE decides for new traces; a caller's sampled flag in
+`traceparent` is followed as-is.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    OTLP_ENDPOINT,
+    OTLP_HEADERS,
+    TRACE_EXPORTER,
+    TRACE_FILE,
+    TRACE_SAMPLE_RATE,
+    TRACE_SERVICE_NAME,
+)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+_exporter = None
+
+
+class _Trace:
+    __slots__ = ("spans", "done")
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.done = False
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_trace")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], trace: _Trace, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._trace = trace
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Scope:
+    """Makes a span current for a block and records it when the block ends."""
+    __slots__ = ("span", "root", "_token")
+
+    def __init__(self, span: Span, root: bool = False):
+        self.span = span
+        self.root = root  # the first span of this trace in this process: ending it exports the trace
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        trace = span._trace
+        if trace.done:
+            # Ended after its trace was exported (e.g. a background refresh).
+            _export([span])
+            return
+        trace.spans.append(span)
+        if self.root:
+            trace.done = True
+            _export(trace.spans)
+
+
+class _NoScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP = _NoScope()
+
+
+def _parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3][:2], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def trace(name: str, traceparent: Optional[str] = None, **attributes: Any):
+    """
+    Start a span: a child of the current span if there is one, otherwise the
+    root of a new trace (continuing `traceparent` if given), subject to
+    sampling. Use as `with trace(...) as span:`; `span` is None if unsampled.
+    """
+    parent = _current.get()
+    if parent is not None:
+        return _Scope(Span(name, parent.trace_id, parent.span_id, parent._trace, attributes))
+    remote = _parse_traceparent(traceparent) if traceparent else None
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id = None, None
+        sampled = TRACE_SAMPLE_RATE >= 1.0 or (TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE)
+    if not sampled:
+        return _NOOP
+    return _Scope(Span(name, trace_id or os.urandom(16).hex(), parent_id, _Trace(), attributes), root=True)
+
+
+def span(name: str, **attributes: Any):
+    """A child span of the current one; a no-op outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return _Scope(Span(name, parent.trace_id, parent.span_id, parent._trace, attributes))
+
+
+def note(key: str, value: Any) -> None:
+    current = _current.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def inject(headers: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """`headers` plus the current span's `traceparent`; unchanged outside a trace."""
+    current = _current.get()
+    if current is None:
+        return headers
+    return {**(headers or {}), "traceparent": current.traceparent}
+
+
+class TraceMiddleware:
+    """ASGI middleware starting a trace per MCP HTTP request."""
+
+    def __init__(self, app, paths: Tuple[str, ...] = ("/mcp",)):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].rstrip("/") not in self.paths:
+            return await self.app(scope, receive, send)
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        with trace(f"{scope['method']} {scope['path']}", traceparent, transport="streamable-http"):
+            return await self.app(scope, receive, send)
+
+
+# === Exporters ===
+
+class InMemoryExporter:
+    """Keeps finished spans in `spans`; for tests."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"exporter": "memory", "spans": len(self.spans)}
+
+
+class _BackgroundExporter:
+    """Hands spans to a worker thread that writes them in batches."""
+
+    kind = "background"
+
+    def __init__(self, batch_size: int = 512, interval: float = 2.0, max_queue: int = 20000):
+        self.batch_size = batch_size
+        self.interval = interval  # longest a span waits before it is written
+        self.max_queue = max_queue
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name=f"trace-{self.kind}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def export(self, spans: List[Span]) -> None:
+        for s in spans:
+            try:
+                self._queue.put_nowait(s)
+            except queue.Full:
+                # Never slow the server down for tracing.
+                self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Optional[Span]] = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            spans = [s for s in batch if s is not None]
+            if spans:
+                try:
+                    self._write(spans)
+                    self.exported += len(spans)
+                except Exception as e:
+                    self.failed += len(spans)
+                    logging.warning("Trace export failed: %s: %s", type(e).__name__, e)
+            if stop:
+                return
+
+    def _write(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Write what is queued and stop the worker thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"exporter": self.kind, "exported": self.exported, "dropped": self.dropped, "failed": self.failed}
+
+
+class FileExporter(_BackgroundExporter):
+    """Appends one JSON object per span to `path`."""
+
+    kind = "file"
+
+    def __init__(self, path: str, **kwargs: Any):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def _write(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans))
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter(_BackgroundExporter):
+    """Sends spans to an OpenTelemetry collector as OTLP/HTTP JSON."""
+
+    kind = "otlp"
+
+    def __init__(self, endpoint: str, service_name: str, headers: Optional[Dict[str, str]] = None,
+                 timeout: float = 10.0, **kwargs: Any):
+        import httpx
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._http = httpx.Client(timeout=timeout, headers={"Content-Type": "application/json", **(headers or {})})
+        super().__init__(**kwargs)
+
+    def _encode(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "emotionsin.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": 1,  # INTERNAL
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def _write(self, spans: List[Span]) -> None:
+        self._http.post(self.endpoint, content=json.dumps(self._encode(spans))).raise_for_status()
+
+    def close(self) -> None:
+        super().close()
+        self._http.close()
+
+
+def _parse_headers(value: str) -> Dict[str, str]:
+    headers = {}
+    for pair in value.split(","):
+        key, sep, val = pair.partition("=")
+        if sep and key.strip():
+            headers[key.strip()] = val.strip()
+    return headers
+
+
+def _create_exporter():
+    if TRACE_EXPORTER == "memory":
+        return InMemoryExporter()
+    if TRACE_EXPORTER == "otlp":
+        if not OTLP_ENDPOINT:
+            logging.warning("TRACE_EXPORTER=otlp but OTEL_EXPORTER_OTLP_ENDPOINT is not set; writing traces to %s", TRACE_FILE)
+            return FileExporter(TRACE_FILE)
+        return OTLPExporter(OTLP_ENDPOINT, TRACE_SERVICE_NAME, headers=_parse_headers(OTLP_HEADERS))
+    return FileExporter(TRACE_FILE)
+
+
+def get_exporter():
+    """The active exporter, created on first use (so nothing starts while tracing is off)."""
+    global _exporter
+    if _exporter is None:
+        _exporter = _create_exporter()
+    return _exporter
+
+
+def set_exporter(exporter) -> None:
+    """Replace the exporter, e.g. with an `InMemoryExporter` in tests."""
+    global _exporter
+    _exporter = exporter
+
+
+def _export(spans: List[Span]) -> None:
+    try:
+        get_exporter().export(spans)
+    except Exception as e:
+        logging.warning("Trace export failed: %s: %s", type(e).__name__, e)
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "sample_rate": TRACE_SAMPLE_RATE,
+        **(_exporter.stats() if _exporter is not None else {"exporter": TRACE_EXPORTER}),
+    }